@@ -13,16 +13,45 @@
 # limitations under the License.
 
 import json
-from falcon import HTTP_200
+
+import falcon
+from falcon import HTTP_200, HTTP_202
 
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from armada.api.jobs import get_job_manager
+from armada.api.tiller_controller import invalidate_releases
+from armada.exceptions.api_exceptions import JobQueueFullException
 from armada.handlers.armada import Armada as Handler
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
+# seconds between keepalive comments on idle event streams
+EVENT_STREAM_HEARTBEAT = 15
+
+
+def apply_job(job, documents, opts):
+    '''
+    Run an apply in the background, recording chart progress and the
+    timeline of the apply in the job
+    '''
+    armada = Handler(documents,
+                     disable_update_pre=opts['disable_update_pre'],
+                     disable_update_post=opts['disable_update_post'],
+                     enable_chart_cleanup=opts['enable_chart_cleanup'],
+                     dry_run=opts['dry_run'],
+                     wait=opts['wait'],
+                     timeout=opts['timeout'])
+    armada.add_listener(job.on_event)
+
+    try:
+        armada.sync()
+    finally:
+        job.set_timeline(armada.timeline.to_dict())
+        invalidate_releases()
+
 
 class Apply(object):
     '''
@@ -38,16 +67,96 @@ class Apply(object):
         # Encode filename
         data['file'] = data['file'].encode('utf-8')
 
-        armada = Handler(open('../../' + data['file']),
-                         disable_update_pre=opts['disable_update_pre'],
-                         disable_update_post=opts['disable_update_post'],
-                         enable_chart_cleanup=opts['enable_chart_cleanup'],
-                         dry_run=opts['dry_run'],
-                         wait=opts['wait'],
-                         timeout=opts['timeout'])
+        with open('../../' + data['file']) as f:
+            documents = f.read()
 
-        armada.sync()
+        # the apply runs in the background, the client polls the job
+        try:
+            job = get_job_manager().submit(apply_job, documents, opts)
+        except JobQueueFullException as e:
+            raise falcon.HTTPServiceUnavailable(
+                'Too many apply jobs', str(e), retry_after=60)
+
+        resp.data = json.dumps(job.to_dict())
+        resp.location = '/armada/jobs/' + job.id
+        resp.content_type = 'application/json'
+        resp.status = HTTP_202
+
+
+class Jobs(object):
+    '''
+    apply jobs endpoint service
+    '''
+
+    def on_get(self, req, resp):
+        jobs = [job.to_dict() for job in get_job_manager().list()]
+
+        resp.data = json.dumps({'jobs': jobs})
+        resp.content_type = 'application/json'
+        resp.status = HTTP_200
+
+
+class Job(object):
+    '''
+    apply job status endpoint service
+    '''
 
-        resp.data = json.dumps({'message': 'Success'})
+    def on_get(self, req, resp, job_id):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            raise falcon.HTTPNotFound()
+
+        resp.data = json.dumps(job.to_dict(timeline=True))
         resp.content_type = 'application/json'
         resp.status = HTTP_200
+
+
+class JobEvents(object):
+    '''
+    apply job event stream endpoint service
+
+    Streams the events of a job while it runs, as newline delimited JSON
+    or, when requested with ?format=sse or an Accept header of
+    text/event-stream, as Server-Sent Events. The stream ends when the
+    job finishes.
+    '''
+
+    def on_get(self, req, resp, job_id):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            raise falcon.HTTPNotFound()
+
+        stream_format = req.get_param('format')
+        if stream_format is None:
+            accept = req.accept or ''
+            if 'text/event-stream' in accept:
+                stream_format = 'sse'
+            else:
+                stream_format = 'ndjson'
+
+        if stream_format == 'sse':
+            resp.content_type = 'text/event-stream'
+            resp.stream = self._sse(job)
+        elif stream_format == 'ndjson':
+            resp.content_type = 'application/x-ndjson'
+            resp.stream = self._ndjson(job)
+        else:
+            raise falcon.HTTPBadRequest(
+                'Invalid format', 'Format must be one of ndjson, sse.')
+
+        resp.set_header('Cache-Control', 'no-cache')
+        resp.status = HTTP_200
+
+    def _ndjson(self, job):
+        for event in job.iter_events(heartbeat=EVENT_STREAM_HEARTBEAT):
+            if event is not None:
+                yield json.dumps(event) + '\n'
+
+    def _sse(self, job):
+        for event in job.iter_events(heartbeat=EVENT_STREAM_HEARTBEAT):
+            if event is None:
+                # comments keep proxies from closing idle connections
+                yield ': keepalive\n\n'
+            else:
+                yield 'event: %s\ndata: %s\n\n' % (event['event'],
+                                                   json.dumps(event))
@@ -0,0 +1,244 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+import uuid
+
+from concurrent import futures
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from armada.exceptions.api_exceptions import JobQueueFullException
+from armada.utils import tracing
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+
+# number of finished jobs kept for status requests
+JOB_HISTORY = 100
+
+
+class Job(object):
+    '''
+    A background apply and the progress of its charts
+    '''
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = STATUS_QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.charts = collections.OrderedDict()
+        self.events = []
+        # timeline of the finished apply, see Timeline.to_dict
+        self.timeline = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def on_event(self, event):
+        '''
+        Record an Armada progress event, see Armada.add_listener
+        '''
+        with self._lock:
+            self.events.append(event)
+            self.charts[event['release']] = {
+                'status': event['event'],
+                'duration': event['duration'],
+            }
+            if 'error' in event:
+                self.charts[event['release']]['error'] = event['error']
+            self._changed.notify_all()
+
+    def set_status(self, status, error=None):
+        '''
+        Move the job to a new status, finishing it unless it is running
+        '''
+        with self._lock:
+            now = time.time()
+            self.status = status
+            self.error = error
+            if status == STATUS_RUNNING:
+                self.started = now
+            else:
+                self.finished = now
+
+            event = {'event': 'job', 'status': status, 'time': now}
+            if error is not None:
+                event['error'] = error
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def set_timeline(self, timeline):
+        '''
+        :params timeline - dict of the apply timeline
+        '''
+        with self._lock:
+            self.timeline = timeline
+
+    def iter_events(self, heartbeat=None):
+        '''
+        :params heartbeat - seconds to wait for an event before yielding
+                            None, wait forever when None
+
+        Yield the events of the job as they happen, starting with the
+        first one, until the job is finished
+        '''
+        index = 0
+        while True:
+            with self._lock:
+                if index >= len(self.events) and self.finished is None:
+                    self._changed.wait(heartbeat)
+                events = self.events[index:]
+                finished = self.finished is not None
+
+            index += len(events)
+            for event in events:
+                yield event
+
+            if finished and not events:
+                return
+            if not events:
+                yield None
+
+    def to_dict(self, timeline=False):
+        '''
+        :params timeline - include the timeline of the apply, None until
+                           the apply ends
+        '''
+        with self._lock:
+            result = {
+                'id': self.id,
+                'status': self.status,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished,
+                'error': self.error,
+                'charts': collections.OrderedDict(
+                    (release, dict(chart))
+                    for release, chart in self.charts.items()),
+            }
+            if timeline:
+                result['timeline'] = self.timeline
+            return result
+
+
+class JobManager(object):
+    '''
+    Runs jobs on a bounded thread pool
+
+    At most max_workers jobs run at the same time and at most max_queued
+    wait for a free worker, further jobs are rejected. The pool is only
+    created with the first job, after the API server forked its workers.
+    '''
+
+    def __init__(self, max_workers, max_queued, history=JOB_HISTORY):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.history = history
+        self.jobs = collections.OrderedDict()
+        self._executor = None
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        :params func - called with the job followed by args and kwargs
+
+        Queue func and return its Job. Raises JobQueueFullException when
+        max_queued jobs are already waiting.
+        '''
+        job = Job()
+        # the job continues the trace of the request submitting it
+        context = tracing.current_context()
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise JobQueueFullException(self._queued)
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers)
+            self._queued += 1
+            self.jobs[job.id] = job
+            self._prune()
+            self._executor.submit(self._run, job, context, func, args,
+                                  kwargs)
+
+        LOG.info("Queued job %s", job.id)
+        return job
+
+    def _run(self, job, context, func, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+        job.set_status(STATUS_RUNNING)
+        LOG.info("Running job %s", job.id)
+        try:
+            with tracing.attach(context):
+                with tracing.span('job', job_id=job.id):
+                    func(job, *args, **kwargs)
+        except Exception as e:
+            LOG.exception("Job %s failed", job.id)
+            job.set_status(STATUS_FAILED, error=str(e))
+        else:
+            job.set_status(STATUS_SUCCEEDED)
+
+    def _prune(self):
+        # forget the oldest finished jobs beyond the history limit
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        '''
+        Return the job with the id, or None
+        '''
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        '''
+        Return all known jobs, oldest first
+        '''
+        with self._lock:
+            return list(self.jobs.values())
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    '''
+    Return the job manager of this process, configured from armada.conf
+    '''
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(CONF.apply_job_workers,
+                                  CONF.apply_job_queue_depth)
+        return _manager
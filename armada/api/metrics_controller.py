@@ -0,0 +1,31 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from falcon import HTTP_200
+
+from armada.utils import metrics
+
+
+class Metrics(object):
+    '''
+    metrics endpoint service
+    '''
+
+    def on_get(self, req, resp):
+        '''
+        get the metrics of this API process in the Prometheus text format
+        '''
+        resp.data = metrics.render().encode('utf-8')
+        resp.content_type = metrics.CONTENT_TYPE
+        resp.status = HTTP_200
@@ -12,62 +12,153 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import calendar
+import hashlib
+import threading
+import time
+
 import falcon
 
-from keystoneauth1 import session
-from keystoneauth1.identity import v3
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from armada.utils import metrics
+from armada.utils import tracing
+from armada.utils.cache import TTLCache
+
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
+# endpoints served without authentication
+PUBLIC_PATHS = ('/metrics',)
+
+REQUEST_DURATION = metrics.histogram(
+    'armada_api_request_duration_seconds',
+    'Duration of API requests by route, method and status.',
+    ['route', 'method', 'status'])
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_keystone_session():
+    '''
+    Return the keystone session of this process
+
+    The session carries no authentication of its own, every request
+    passes the auth plugin of the caller's token. Sharing it lets all
+    requests to keystone reuse pooled connections.
+    '''
+    global _session
+    with _session_lock:
+        if _session is None:
+            from keystoneauth1 import session
+            _session = session.Session()
+        return _session
+
 
 class AuthMiddleware(object):
 
+    def __init__(self):
+        # token digest -> role names of the token
+        self.tokens = TTLCache(CONF.token_cache_size, CONF.token_cache_ttl)
+        # role id -> role name
+        self.role_names = TTLCache(CONF.token_cache_size,
+                                   CONF.token_cache_ttl)
+
     def process_request(self, req, resp):
+        if req.path in PUBLIC_PATHS:
+            return
 
-        # Validate token and get user session
         token = req.get_header('X-Auth-Token')
-        req.context['session'] = self._get_user_session(token)
+        if not token:
+            raise falcon.HTTPUnauthorized('Authentication required',
+                                          ('Authentication token is missing.'))
+
+        # tokens are only kept as digests
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        roles = self.tokens.get(key)
+        if roles is None:
+            # Validate token and get user session
+            session = get_keystone_session()
+            auth = self._get_user_auth(token)
+            access = self._get_access(session, auth)
+            roles = self._get_roles(session, auth, access)
+
+            # never trust a cached token beyond its expiry
+            expires = None
+            if access.expires is not None:
+                expires = calendar.timegm(access.expires.utctimetuple())
+            self.tokens.set(key, roles, expires=expires)
+        else:
+            LOG.debug("Using cached roles of token %s", key[:8])
 
         # Add token roles to request context
-        req.context['roles'] = self._get_roles(req.context['session'])
+        req.context['roles'] = roles
 
-    def _get_roles(self, session):
+    def _get_roles(self, session, auth, access):
 
-        # Get roles IDs associated with user
-        request_url = CONF.auth_url + '/role_assignments'
-        resp = self._session_request(session=session, request_url=request_url)
+        # Get the roles of the user on the project, with their names, in
+        # a single request
+        request_url = (CONF.auth_url + '/role_assignments?effective'
+                       '&include_names=1&user.id={}&scope.project.id={}'
+                       .format(access.user_id, access.project_id))
+        resp = self._session_request(session=session, auth=auth,
+                                     request_url=request_url)
 
         json_resp = resp.json()['role_assignments']
-        role_ids = [r['role']['id'].encode('utf-8') for r in json_resp]
 
-        # Get role names associated with role IDs
         roles = []
-        for role_id in role_ids:
-            request_url = CONF.auth_url + '/roles/' + role_id
-            resp = self._session_request(session=session,
+        for assignment in json_resp:
+            role_id = assignment['role']['id'].encode('utf-8')
+            role = assignment['role'].get('name')
+            if role is not None:
+                role = role.encode('utf-8')
+                self.role_names.set(role_id, role)
+            else:
+                # keystone before Ocata ignores include_names
+                role = self._get_role_name(session, auth, role_id)
+            if role is not None and role not in roles:
+                roles.append(role)
+
+        return roles
+
+    def _get_role_name(self, session, auth, role_id):
+        role = self.role_names.get(role_id)
+        if role is None:
+            # one listing resolves every role at once
+            request_url = CONF.auth_url + '/roles'
+            resp = self._session_request(session=session, auth=auth,
                                          request_url=request_url)
 
-            role = resp.json()['role']['name'].encode('utf-8')
-            roles.append(role)
+            for r in resp.json()['roles']:
+                r_id = r['id'].encode('utf-8')
+                name = r['name'].encode('utf-8')
+                self.role_names.set(r_id, name)
+                if r_id == role_id:
+                    role = name
 
-        return roles
+        return role
 
-    def _get_user_session(self, token):
+    def _get_user_auth(self, token):
+        from keystoneauth1.identity import v3
 
-        # Get user session from token
-        auth = v3.Token(auth_url=CONF.auth_url,
+        # Get user auth plugin from token
+        return v3.Token(auth_url=CONF.auth_url,
                         project_name=CONF.project_name,
                         project_domain_name=CONF.project_domain_name,
                         token=token)
 
-        return session.Session(auth=auth)
+    def _get_access(self, session, auth):
+        try:
+            return auth.get_access(session)
+        except:
+            raise falcon.HTTPUnauthorized('Authentication required',
+                                          ('Authentication token is invalid.'))
 
-    def _session_request(self, session, request_url):
+    def _session_request(self, session, auth, request_url):
         try:
-            return session.get(request_url)
+            return session.get(request_url, auth=auth)
         except:
             raise falcon.HTTPUnauthorized('Authentication required',
                                           ('Authentication token is invalid.'))
@@ -75,6 +166,9 @@ class AuthMiddleware(object):
 class RoleMiddleware(object):
 
     def process_request(self, req, resp):
+        if req.path in PUBLIC_PATHS:
+            return
+
         endpoint = req.path
         roles = req.context['roles']
 
@@ -87,13 +181,74 @@ class RoleMiddleware(object):
 
         # Compare the verified roles listed in the config with the user's
         # associated roles
-        if endpoint == '/armada/apply':
+        if endpoint == '/armada/apply' or endpoint.startswith('/armada/jobs'):
             approved_roles = CONF.armada_apply_roles
         elif endpoint == '/tiller/releases':
             approved_roles = CONF.tiller_release_roles
         elif endpoint == '/tiller/status':
             approved_roles = CONF.tiller_status_roles
+        else:
+            approved_roles = []
 
         verified_roles = set(roles).intersection(approved_roles)
 
         return bool(verified_roles)
+
+
+class MetricsMiddleware(object):
+    '''
+    Records the latency of every request
+
+    Requests are labelled with the resource serving them rather than the
+    path, so job ids do not create a series per job.
+    '''
+
+    def process_request(self, req, resp):
+        req.context['start'] = time.time()
+
+    def process_response(self, req, resp, resource):
+        start = req.context.get('start')
+        if start is None:
+            return
+
+        route = type(resource).__name__ if resource is not None else 'none'
+        REQUEST_DURATION.observe(time.time() - start, route=route,
+                                 method=req.method,
+                                 status=resp.status.split(' ', 1)[0])
+
+
+class TracingMiddleware(object):
+    '''
+    Records every request as a span while tracing is enabled
+
+    The span continues the trace of a W3C traceparent request header and
+    is the parent of the spans of the request, including those of apply
+    jobs it submits.
+    '''
+
+    def process_request(self, req, resp):
+        if not tracing.enabled():
+            return
+
+        parent = tracing.SpanContext.from_traceparent(
+            req.get_header('traceparent'))
+        attach = tracing.attach(parent)
+        attach.__enter__()
+        span = tracing.span('{} {}'.format(req.method, req.path),
+                            **{'http.method': req.method,
+                               'http.target': req.path})
+        span.__enter__()
+        req.context['trace'] = (attach, span)
+
+    def process_response(self, req, resp, resource):
+        trace = req.context.pop('trace', None)
+        if trace is None:
+            return
+
+        attach, span = trace
+        current = tracing.current_span()
+        if current is not None:
+            current.set_attribute('http.status_code',
+                                  resp.status.split(' ', 1)[0])
+        span.__exit__(None, None, None)
+        attach.__exit__(None, None, None)
@@ -18,10 +18,17 @@ from oslo_config import cfg
 from oslo_log import log as logging
 
 import armada.conf as configs
+from armada.utils import tracing
 
 from armada_controller import Apply
+from armada_controller import Job
+from armada_controller import JobEvents
+from armada_controller import Jobs
+from metrics_controller import Metrics
 from middleware import AuthMiddleware
+from middleware import MetricsMiddleware
 from middleware import RoleMiddleware
+from middleware import TracingMiddleware
 from tiller_controller import Release
 from tiller_controller import Status
 
@@ -35,16 +42,25 @@ def create(middleware=CONF.middleware):
     logging.set_defaults(default_log_levels=CONF.default_log_levels)
     logging.setup(CONF, 'armada')
 
+    if CONF.trace_file:
+        tracing.configure(tracing.FileExporter(CONF.trace_file))
+
     if middleware:
-        api = falcon.API(middleware=[AuthMiddleware(), RoleMiddleware()])
+        api = falcon.API(middleware=[TracingMiddleware(), MetricsMiddleware(),
+                                     AuthMiddleware(), RoleMiddleware()])
     else:
-        api = falcon.API()
+        api = falcon.API(middleware=[TracingMiddleware(),
+                                     MetricsMiddleware()])
 
     # Configure API routing
     url_routes = (
         ('/tiller/status', Status()),
         ('/tiller/releases', Release()),
-        ('/armada/apply/', Apply())
+        ('/armada/apply/', Apply()),
+        ('/armada/jobs', Jobs()),
+        ('/armada/jobs/{job_id}', Job()),
+        ('/armada/jobs/{job_id}/events', JobEvents()),
+        ('/metrics', Metrics())
     )
 
     for route, service in url_routes:
@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import hashlib
 import json
-from falcon import HTTP_200
+import threading
+
+from falcon import HTTP_200, HTTP_304
 
 from oslo_config import cfg
 from oslo_log import log as logging
 
 from armada.handlers.tiller import Tiller as tillerHandler
+from armada.utils.cache import TTLCache
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
@@ -41,17 +46,113 @@ class Status(object):
         resp.status = HTTP_200
 
 class Release(object):
+    '''
+    tiller release listing endpoint service
+
+    Serves a cached summary of the releases, see get_releases, with an
+    ETag so clients polling an unchanged list get 304 Not Modified.
+    Supports the query parameters status (repeatable, e.g. deployed or
+    failed), limit and offset. The X-Total-Count header carries the
+    number of matching releases before pagination.
+    '''
+
     def on_get(self, req, resp):
         '''
         get tiller releases
         '''
-        # Get tiller releases
-        handler = tillerHandler()
+        statuses = req.get_param_as_list('status')
+        limit = req.get_param_as_int('limit', min=0)
+        offset = req.get_param_as_int('offset', min=0) or 0
+
+        matching = get_releases()
+        if statuses:
+            statuses = set(status.upper() for status in statuses)
+            matching = [r for r in matching if r[2] in statuses]
+
+        page = matching[offset:]
+        if limit is not None:
+            page = page[:limit]
 
-        releases = {}
-        for release in handler.list_releases():
-            releases[release.name] = release.namespace
+        releases = collections.OrderedDict(
+            (name, namespace) for name, namespace, _ in page)
+        data = json.dumps({'releases': releases})
 
-        resp.data = json.dumps({'releases': releases})
+        etag = '"%s"' % hashlib.sha256(data.encode('utf-8')).hexdigest()
+        resp.etag = etag
+        resp.set_header('X-Total-Count', str(len(matching)))
+        resp.set_header('Cache-Control', 'no-cache')
+
+        if etag_matches(req.if_none_match, etag):
+            resp.status = HTTP_304
+            return
+
+        resp.data = data
         resp.content_type = 'application/json'
         resp.status = HTTP_200
+
+
+def etag_matches(header, etag):
+    '''
+    :params header - value of an If-None-Match header, or None
+    :params etag - quoted entity tag of the current response
+
+    Returns True if the header names the entity tag
+    '''
+    if not header:
+        return False
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag == etag:
+            return True
+    return False
+
+
+_releases = None
+_releases_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+# key of the release summary in the cache
+RELEASES_KEY = 'releases'
+
+
+def _get_release_cache():
+    global _releases
+    with _releases_lock:
+        if _releases is None:
+            _releases = TTLCache(1, CONF.tiller_release_cache_ttl)
+        return _releases
+
+
+def get_releases():
+    '''
+    Return the (name, namespace, status) of every release, sorted by name
+
+    Tiller is asked at most once every tiller_release_cache_ttl seconds,
+    concurrent requests wait for a single refresh.
+    '''
+    cache = _get_release_cache()
+    releases = cache.get(RELEASES_KEY)
+    if releases is None:
+        with _refresh_lock:
+            releases = cache.get(RELEASES_KEY)
+            if releases is None:
+                releases = []
+                for release in tillerHandler().list_releases() or []:
+                    status = release.info.status.Code.Name(
+                        release.info.status.code)
+                    releases.append(
+                        (release.name, release.namespace, status))
+                releases.sort()
+                cache.set(RELEASES_KEY, releases)
+    return releases
+
+
+def invalidate_releases():
+    '''
+    Drop the cached release summary, e.g. after an apply changed releases
+    '''
+    with _releases_lock:
+        if _releases is not None:
+            _releases.clear()
@@ -0,0 +1,80 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from gunicorn.app.base import BaseApplication
+from oslo_config import cfg
+
+import armada.conf as configs
+
+configs.set_app_default_configs()
+CONF = cfg.CONF
+
+
+def get_options():
+    '''
+    Return the gunicorn settings configured in armada.conf
+    '''
+    return {
+        'bind': CONF.api_bind,
+        'workers': CONF.api_workers,
+        'worker_class': CONF.api_worker_class,
+        'threads': CONF.api_threads,
+        'timeout': CONF.api_timeout,
+        'graceful_timeout': CONF.api_graceful_timeout,
+        'keepalive': CONF.api_keepalive,
+        'preload_app': CONF.api_preload,
+    }
+
+
+class ArmadaApplication(BaseApplication):
+    '''
+    gunicorn server of the Armada API configured from armada.conf
+
+    Unless api_preload is set every worker imports the API after it is
+    forked. The import starts the threads of gRPC, which a forked worker
+    does not inherit, and its Tiller calls would hang.
+    '''
+
+    def __init__(self, options=None):
+        '''
+        :params options - gunicorn settings, see get_options
+        '''
+        self.options = get_options() if options is None else options
+        super(ArmadaApplication, self).__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from armada.api.server import api
+        return api
+
+
+def main(argv=None):
+    '''
+    Run the API server, e.g. armada-api --config-file armada.conf
+    '''
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        CONF(argv, project='armada')
+
+    ArmadaApplication().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -14,9 +14,17 @@
 
 from cliff import command as cmd
 
-from armada.handlers.armada import Armada
+from armada.utils import metrics
+from armada.utils import profiler
+from armada.utils import tracing
 
 def applyCharts(args):
+    # the apply engine pulls in grpc, the hapi protobufs and the chart
+    # source libraries, so only import it once a command actually runs
+    from armada.handlers.armada import Armada
+
+    if args.trace_file:
+        tracing.configure(tracing.FileExporter(args.trace_file))
 
     armada = Armada(open(args.file).read(),
                     args.disable_update_pre,
@@ -27,8 +35,14 @@ def applyCharts(args):
                     args.timeout,
                     args.tiller_host,
                     args.tiller_port,
-                    args.debug_logging)
-    armada.sync()
+                    args.debug_logging,
+                    timeline_file=args.timeline_file,
+                    chrome_trace_file=args.chrome_trace_file)
+    try:
+        armada.sync()
+    finally:
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
 
 class ApplyChartsCommand(cmd.Command):
     def get_parser(self, prog_name):
@@ -55,7 +69,27 @@ class ApplyChartsCommand(cmd.Command):
                             help='Specify the tiller host')
         parser.add_argument('--tiller-port', action='store', type=int,
                             default=44134, help='Specify the tiller port')
+        parser.add_argument('--metrics-file', action='store', type=str,
+                            help='Write the metrics of the run to this file '
+                                 'in the Prometheus text format')
+        parser.add_argument('--timeline-file', action='store', type=str,
+                            help='Write the start and end of every phase '
+                                 'of the run to this JSON file')
+        parser.add_argument('--chrome-trace-file', action='store', type=str,
+                            help='Write the timeline of the run to this '
+                                 'file in the Chrome trace event format')
+        parser.add_argument('--trace-file', action='store', type=str,
+                            help='Append the tracing spans of the run to '
+                                 'this file, one JSON object per line')
+        parser.add_argument('--profile', action='store', type=str,
+                            metavar='FILE',
+                            help='Profile the run, writing pstats to FILE '
+                                 'and collapsed stacks to FILE.collapsed')
         return parser
 
     def take_action(self, parsed_args):
-        applyCharts(parsed_args)
+        if parsed_args.profile:
+            profiler.profile(lambda: applyCharts(parsed_args),
+                             parsed_args.profile)
+        else:
+            applyCharts(parsed_args)
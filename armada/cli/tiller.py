@@ -14,8 +14,6 @@
 
 from cliff import command as cmd
 
-from armada.handlers.tiller import Tiller
-
 from oslo_config import cfg
 from oslo_log import log as logging
 
@@ -24,6 +22,7 @@ LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
 def tillerServer(args):
+    from armada.handlers.tiller import Tiller
 
     tiller = Tiller()
 
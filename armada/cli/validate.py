@@ -15,6 +15,7 @@
 from cliff import command as cmd
 import yaml
 
+from armada.utils import profiler
 from armada.utils.lint import validate_armada_documents, validate_armada_object
 from armada.handlers.manifest import Manifest
 
@@ -42,7 +43,15 @@ class ValidateYamlCommand(cmd.Command):
         parser = super(ValidateYamlCommand, self).get_parser(prog_name)
         parser.add_argument('file', type=str, metavar='FILE',
                             help='Armada yaml file to validate')
+        parser.add_argument('--profile', action='store', type=str,
+                            metavar='FILE',
+                            help='Profile the run, writing pstats to FILE '
+                                 'and collapsed stacks to FILE.collapsed')
         return parser
 
     def take_action(self, parsed_args):
-        validateYaml(parsed_args)
+        if parsed_args.profile:
+            profiler.profile(lambda: validateYaml(parsed_args),
+                             parsed_args.profile)
+        else:
+            validateYaml(parsed_args)
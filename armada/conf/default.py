@@ -18,6 +18,88 @@ from armada.conf import utils
 
 default_options = [
 
+    cfg.StrOpt(
+        'api_bind',
+        default='0.0.0.0:8000',
+        help=utils.fmt('Address and port the API server listens on.')),
+
+    cfg.IntOpt(
+        'api_graceful_timeout',
+        default=60,
+        min=0,
+        help=utils.fmt("""
+Seconds API workers get to finish their requests when restarted or stopped.
+""")),
+
+    cfg.IntOpt(
+        'api_keepalive',
+        default=5,
+        min=0,
+        help=utils.fmt("""
+Seconds an idle keep-alive connection of the API server stays open.
+""")),
+
+    cfg.BoolOpt(
+        'api_preload',
+        default=False,
+        help=utils.fmt("""
+Load the API before forking the workers, so they share its memory. gRPC
+starts its threads when the API is loaded and Tiller calls of forked workers
+hang, so only enable this when the workers do not talk to Tiller.
+""")),
+
+    cfg.IntOpt(
+        'api_threads',
+        default=16,
+        min=1,
+        help=utils.fmt("""
+Number of threads of each API worker. Every open job event stream holds a
+thread for as long as the apply runs.
+""")),
+
+    cfg.IntOpt(
+        'api_timeout',
+        default=3600,
+        min=0,
+        help=utils.fmt("""
+Seconds an API worker may stay silent before it is restarted. Sync workers are
+silent for the whole request, so this bounds the longest request they serve.
+""")),
+
+    cfg.StrOpt(
+        'api_worker_class',
+        default='gthread',
+        choices=['sync', 'gthread', 'gevent', 'eventlet'],
+        help=utils.fmt("""
+gunicorn worker class of the API server. gevent and eventlet require the
+respective package.
+""")),
+
+    cfg.IntOpt(
+        'api_workers',
+        default=1,
+        min=1,
+        help=utils.fmt("""
+Number of API worker processes. Apply jobs are only known to the worker that
+runs them, so with more than one worker a job status request may reach a
+worker that does not know the job.
+""")),
+
+    cfg.IntOpt(
+        'apply_job_queue_depth',
+        default=16,
+        min=0,
+        help=utils.fmt("""
+Maximum number of apply jobs waiting for a free worker, further apply
+requests are rejected.
+""")),
+
+    cfg.IntOpt(
+        'apply_job_workers',
+        default=2,
+        min=1,
+        help=utils.fmt('Number of apply jobs run at the same time.')),
+
     cfg.ListOpt(
         'armada_apply_roles',
         default=['admin'],
@@ -57,6 +139,14 @@ The Keystone project domain name used for authentication.
         default='/home/user/.ssh/',
         help=utils.fmt('Path to SSH private key.')),
 
+    cfg.IntOpt(
+        'tiller_release_cache_ttl',
+        default=10,
+        min=0,
+        help=utils.fmt("""
+Seconds the release listing of the API is cached for, 0 disables the cache.
+""")),
+
     cfg.ListOpt(
         'tiller_release_roles',
         default=['admin'],
@@ -65,7 +155,32 @@ The Keystone project domain name used for authentication.
     cfg.ListOpt(
         'tiller_status_roles',
         default=['admin'],
-        help=utils.fmt('IDs of approved API access roles.'))
+        help=utils.fmt('IDs of approved API access roles.')),
+
+    cfg.IntOpt(
+        'token_cache_size',
+        default=1000,
+        min=0,
+        help=utils.fmt("""
+Maximum number of validated Keystone tokens cached with their roles, 0
+disables the cache.
+""")),
+
+    cfg.IntOpt(
+        'token_cache_ttl',
+        default=300,
+        min=0,
+        help=utils.fmt("""
+Seconds a validated Keystone token and its roles are cached for. Tokens are
+never cached beyond their expiry.
+""")),
+
+    cfg.StrOpt(
+        'trace_file',
+        help=utils.fmt("""
+File the tracing spans of API requests and applies are appended to, one JSON
+object per line. Tracing is disabled when not set.
+"""))
 ]
 
 def register_opts(conf):
@@ -27,3 +27,11 @@ KEYWORD_RELEASE = 'release'
 # Statuses
 STATUS_DEPLOYED = 'DEPLOYED'
 STATUS_FAILED = 'FAILED'
+
+# Tiller
+# the standard gRPC max message size is 4MB
+# this expansion comes at a performance penalty
+# but until proper paging is supported, we need
+# to support a larger payload as the current
+# limit is exhausted with just 10 releases
+MAX_MESSAGE_LENGTH = 429496729
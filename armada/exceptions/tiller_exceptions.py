@@ -88,9 +88,9 @@ class PreUpdateJobCreateException(TillerException):
 class ReleaseUninstallException(TillerException):
     '''Exception that occurs when a release fails to uninstall.'''
 
-    def __init__(self, name, namespace):
+    def __init__(self, name, namespace=None):
         self._name = name
-        self._message = 'Failed to uninstall release' + self._name + '.'
+        self._message = 'Failed to uninstall release ' + self._name + '.'
 
         super(ReleaseUninstallException, self).__init__(self._message)
 
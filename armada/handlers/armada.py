@@ -12,14 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import difflib
+import time
 import yaml
 
+from hapi.chart.chart_pb2 import Chart
 from oslo_config import cfg
 from oslo_log import log as logging
 from supermutes.dot import dotify
 
-from chartbuilder import ChartBuilder
+from chartbuilder import ChartBuilder, chart_documents
 from tiller import Tiller
 from manifest import Manifest
 
@@ -31,14 +34,33 @@ from ..exceptions import tiller_exceptions
 from ..utils.release import release_prefix
 from ..utils import source
 from ..utils import lint
+from ..utils import metrics
+from ..utils.timeline import Timeline
+from ..utils import tracing
 from ..const import KEYWORD_ARMADA, KEYWORD_GROUPS, KEYWORD_CHARTS,\
     KEYWORD_PREFIX, STATUS_FAILED
 
 LOG = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = 3600
+# number of chart parts listed in the payload size report
+PAYLOAD_REPORT_LIMIT = 10
+# number of slowest phases logged at the end of an apply
+TIMELINE_REPORT_LIMIT = 10
 CONF = cfg.CONF
 
+APPLY_DURATION = metrics.histogram(
+    'armada_apply_duration_seconds', 'Duration of applies by result.',
+    ['result'])
+CHART_PHASE_DURATION = metrics.histogram(
+    'armada_chart_phase_duration_seconds',
+    'Duration of the fetch, build, diff, rpc and wait phases of charts.',
+    ['chart', 'phase'])
+SOURCE_CACHE = metrics.counter(
+    'armada_source_cache_total',
+    'Chart source lookups served by an earlier fetch of the same apply.',
+    ['type', 'result'])
+
 
 class Armada(object):
     '''
@@ -56,10 +78,16 @@ class Armada(object):
                  timeout=DEFAULT_TIMEOUT,
                  tiller_host=None,
                  tiller_port=44134,
-                 debug=False):
+                 debug=False,
+                 timeline_file=None,
+                 chrome_trace_file=None):
         '''
         Initialize the Armada Engine and establish
         a connection to Tiller
+
+        :params timeline_file - file the timeline of sync is written to
+        :params chrome_trace_file - file the timeline of sync is written to
+                                    in the Chrome trace event format
         '''
 
         self.disable_update_pre = disable_update_pre
@@ -72,12 +100,68 @@ class Armada(object):
         self.documents = list(yaml.safe_load_all(file))
         self.config = None
         self.debug = debug
+        self.listeners = []
+
+        # phases of sync, shared with tiller to record RPCs and waits
+        self.timeline = Timeline()
+        self.tiller.timeline = self.timeline
+        self.timeline_file = timeline_file
+        self.chrome_trace_file = chrome_trace_file
 
         # Set debug value
         # Define a default handler at INFO logging level
         if self.debug:
             logging.basicConfig(level=logging.DEBUG)
 
+    def add_listener(self, listener):
+        '''
+        :params listener - callable receiving every event as a dict
+
+        Register a listener for the progress of sync. Events carry the
+        event name, the release, a timestamp and the seconds spent, e.g.
+        {'event': 'installed', 'release': 'mariadb', 'time': ...,
+         'duration': 12.5}
+
+        Events are sent as the work happens, in this order per release:
+        fetched, built, diffed (upgrades only), installing or upgrading
+        and finally installed, upgraded, skipped or failed. The duration
+        of the final event covers all the work done after fetching.
+        '''
+        self.listeners.append(listener)
+
+    def notify(self, event, release, start, **data):
+        '''
+        :params event - name of the event
+        :params release - release the event is about
+        :params start - time the work on the release started at
+
+        Send an event to every listener
+        '''
+        now = time.time()
+        data.update(event=event, release=release, time=now,
+                    duration=now - start)
+        for listener in self.listeners:
+            try:
+                listener(dict(data))
+            except Exception:
+                LOG.exception("Listener failed to handle event %s", event)
+
+    @contextlib.contextmanager
+    def phase(self, name, release):
+        '''
+        :params name - phase of the release, e.g. fetch or build
+        :params release - release the phase works on
+
+        Record the seconds spent in the with block for the release
+        '''
+        start = time.time()
+        with self.timeline.span(release, name):
+            try:
+                yield
+            finally:
+                CHART_PHASE_DURATION.observe(time.time() - start,
+                                             chart=release, phase=name)
+
     def get_armada_manifest(self):
         return Manifest(self.documents).get_manifest()
 
@@ -89,6 +173,7 @@ class Armada(object):
             if chart_name == name:
                 return chart, values
 
+    @tracing.traced('Armada.pre_flight_ops')
     def pre_flight_ops(self):
         '''
         Perform a series of checks and operations to ensure proper deployment
@@ -108,17 +193,24 @@ class Armada(object):
         self.config = self.get_armada_manifest()
         # Purge known releases that have failed and are in the current yaml
         prefix = self.config.get(KEYWORD_ARMADA).get(KEYWORD_PREFIX)
-        failed_releases = self.get_releases_by_status(STATUS_FAILED)
-        for release in failed_releases:
-            for group in self.config.get(KEYWORD_ARMADA).get(KEYWORD_GROUPS):
-                for ch in group.get(KEYWORD_CHARTS):
-                    ch_release_name = release_prefix(prefix,
-                                                     ch.get('chart')
-                                                     .get('chart_name'))
-                    if release[0] == ch_release_name:
-                        LOG.info('Purging failed release %s '
-                                 'before deployment', release[0])
-                        self.tiller.uninstall_release(release[0])
+        chart_releases = set()
+        for group in self.config.get(KEYWORD_ARMADA).get(KEYWORD_GROUPS):
+            for ch in group.get(KEYWORD_CHARTS):
+                chart_releases.add(release_prefix(
+                    prefix, ch.get('chart').get('release')))
+
+        purge_releases = []
+        for release in self.get_releases_by_status(STATUS_FAILED):
+            if release[0] in chart_releases:
+                LOG.info('Purging failed release %s '
+                         'before deployment', release[0])
+                purge_releases.append(release[0])
+
+        results = self.tiller.uninstall_releases(purge_releases)
+        failed = [release for release, error in results.items() if error]
+        if failed:
+            raise tiller_exceptions.ReleaseUninstallException(
+                ', '.join(failed))
 
         # Clone the chart sources
         #
@@ -127,37 +219,59 @@ class Armada(object):
         repos = {}
         for group in self.config.get(KEYWORD_ARMADA).get(KEYWORD_GROUPS):
             for ch in group.get(KEYWORD_CHARTS):
-                self.tag_cloned_repo(ch, repos)
+                release = ch.get('chart').get('release')
+                start = time.time()
+                with self.phase('fetch', release):
+                    self.tag_cloned_repo(ch, repos)
 
-                for dep in ch.get('chart').get('dependencies'):
-                    self.tag_cloned_repo(dep, repos)
+                    for dep in ch.get('chart').get('dependencies'):
+                        self.tag_cloned_repo(dep, repos)
 
+                self.notify('fetched', release, start)
+
+    @tracing.traced('Armada.tag_cloned_repo')
     def tag_cloned_repo(self, ch, repos):
         location = ch.get('chart').get('source').get('location')
         ct_type = ch.get('chart').get('source').get('type')
         subpath = ch.get('chart').get('source').get('subpath', '.')
 
+        span = tracing.current_span()
+        if span is not None:
+            span.set_attribute('source.type', ct_type)
+            span.set_attribute('source.location', location)
+
         if ct_type == 'local':
             ch.get('chart')['source_dir'] = (location, subpath)
         elif ct_type == 'tar':
-            LOG.info('Downloading tarball from: %s', location)
-            tarball_dir = source.get_tarball(location)
-            ch.get('chart')['source_dir'] = (tarball_dir, subpath)
+            # charts sharing a tarball reuse its first download
+            tarball = (ct_type, location)
+            if tarball not in repos:
+                SOURCE_CACHE.inc(type=ct_type, result='miss')
+                LOG.info('Downloading tarball from: %s', location)
+                with self.timeline.span(location, 'source', type=ct_type):
+                    repos[tarball] = source.get_tarball(location)
+            else:
+                SOURCE_CACHE.inc(type=ct_type, result='hit')
+            ch.get('chart')['source_dir'] = (repos[tarball], subpath)
         elif ct_type == 'git':
             reference = ch.get('chart').get('source').get('reference',
                                                           'master')
             repo_branch = (location, reference)
 
             if repo_branch not in repos.keys():
+                SOURCE_CACHE.inc(type=ct_type, result='miss')
                 try:
                     LOG.info('Cloning repo: %s branch: %s', *repo_branch)
-                    repo_dir = source.git_clone(*repo_branch)
+                    with self.timeline.span(location, 'source', type=ct_type,
+                                            reference=reference):
+                        repo_dir = source.git_clone(*repo_branch)
                 except Exception:
                     raise source_exceptions.GitLocationException(
                         '{} branch: {}'.format(*repo_branch))
                 repos[repo_branch] = repo_dir
                 ch.get('chart')['source_dir'] = (repo_dir, subpath)
             else:
+                SOURCE_CACHE.inc(type=ct_type, result='hit')
                 ch.get('chart')['source_dir'] = (repos.get(repo_branch),
                                                  subpath)
         else:
@@ -178,15 +292,27 @@ class Armada(object):
 
         return filtered_releases
 
+    @tracing.traced('Armada.sync')
     def sync(self):
         '''
         Syncronize Helm with the Armada Config(s)
         '''
-
+        start = time.time()
+        result = 'failure'
+        try:
+            self._sync()
+            result = 'success'
+        finally:
+            APPLY_DURATION.observe(time.time() - start, result=result)
+            self.timeline.finish()
+            self.report_timeline()
+
+    def _sync(self):
         # TODO: (gardlt) we need to break up this func into
         # a more cleaner format
         LOG.info("Performing Pre-Flight Operations")
-        self.pre_flight_ops()
+        with self.timeline.span('pre-flight', 'armada'):
+            self.pre_flight_ops()
 
         # extract known charts on tiller right now
         known_releases = self.tiller.list_charts()
@@ -199,6 +325,9 @@ class Armada(object):
             LOG.debug("Release %s, Version %s found on tiller", release[0],
                       release[1])
 
+        # dependencies shared by several charts are only built once
+        dependency_cache = {}
+
         for entry in self.config[KEYWORD_ARMADA][KEYWORD_GROUPS]:
             chart_wait = self.wait
 
@@ -211,98 +340,147 @@ class Armada(object):
             LOG.info('Deploying: %s', desc)
 
             for gchart in chart_group:
-                chart = dotify(gchart['chart'])
-                values = gchart.get('chart').get('values', {})
-                pre_actions = {}
-                post_actions = {}
-                LOG.info('%s', chart.release)
-
-                if chart.release is None:
-                    continue
-
-                # retrieve appropriate timeout value if 'wait' is specified
-                chart_timeout = self.timeout
-                if chart_wait:
-                    if chart_timeout == DEFAULT_TIMEOUT:
-                        chart_timeout = getattr(chart, 'timeout',
-                                                chart_timeout)
-
-                chartbuilder = ChartBuilder(chart)
-                protoc_chart = chartbuilder.get_helm_chart()
-
-                # determine install or upgrade by examining known releases
-                LOG.debug("RELEASE: %s", chart.release)
-                deployed_releases = [x[0] for x in known_releases]
-                prefix_chart = release_prefix(prefix, chart.release)
-
-                if prefix_chart in deployed_releases:
-
-                    # indicate to the end user what path we are taking
-                    LOG.info("Upgrading release %s", chart.release)
-                    # extract the installed chart and installed values from the
-                    # latest release so we can compare to the intended state
-                    LOG.info("Checking Pre/Post Actions")
-                    apply_chart, apply_values = self.find_release_chart(
-                        known_releases, prefix_chart)
-
-                    LOG.info("Checking Pre/Post Actions")
-                    upgrade = gchart.get('chart', {}).get('upgrade', False)
-
-                    if upgrade:
-                        if not self.disable_update_pre and upgrade.get(
-                                'pre', False):
-                            pre_actions = getattr(chart.upgrade, 'pre', {})
-
-                        if not self.disable_update_post and upgrade.get(
-                                'post', False):
-                            post_actions = getattr(chart.upgrade, 'post', {})
-
-                    # show delta for both the chart templates and the chart
-                    # values
-                    # TODO(alanmeadows) account for .files differences
-                    # once we support those
-
-                    upgrade_diff = self.show_diff(chart, apply_chart,
-                                                  apply_values,
-                                                  chartbuilder.dump(), values)
-
-                    if not upgrade_diff:
-                        LOG.info("There are no updates found in this chart")
-                        continue
-
-                    # do actual update
-                    self.tiller.update_release(protoc_chart,
-                                               prefix_chart,
-                                               chart.namespace,
-                                               pre_actions=pre_actions,
-                                               post_actions=post_actions,
-                                               dry_run=self.dry_run,
-                                               disable_hooks=chart.
-                                               upgrade.no_hooks,
-                                               values=yaml.safe_dump(values),
-                                               wait=chart_wait,
-                                               timeout=chart_timeout)
-
-                # process install
-                else:
-                    LOG.info("Installing release %s", chart.release)
-                    self.tiller.install_release(protoc_chart,
-                                                prefix_chart,
-                                                chart.namespace,
-                                                dry_run=self.dry_run,
-                                                values=yaml.safe_dump(values),
-                                                wait=chart_wait,
-                                                timeout=chart_timeout)
-
-                LOG.debug("Cleaning up chart source in %s",
-                          chartbuilder.source_directory)
+                release = gchart.get('chart').get('release')
+                start = time.time()
+                try:
+                    with tracing.span('Armada.sync_chart', release=release):
+                        action = self.sync_chart(gchart, chart_wait,
+                                                 known_releases, prefix,
+                                                 dependency_cache)
+                except Exception as e:
+                    self.notify('failed', release, start, error=str(e))
+                    raise
+
+                if action is not None:
+                    self.notify(action, release, start)
 
         LOG.info("Performing Post-Flight Operations")
-        self.post_flight_ops()
+        with self.timeline.span('post-flight', 'armada'):
+            self.post_flight_ops()
 
         if self.enable_chart_cleanup:
-            self.tiller.chart_cleanup(
-                prefix, self.config[KEYWORD_ARMADA][KEYWORD_GROUPS])
+            with self.timeline.span('chart-cleanup', 'armada'):
+                self.tiller.chart_cleanup(
+                    prefix, self.config[KEYWORD_ARMADA][KEYWORD_GROUPS])
+
+    def sync_chart(self, gchart, chart_wait, known_releases, prefix,
+                   dependency_cache):
+        '''
+        :params gchart - chart entry of a chart group
+        :params chart_wait - whether to wait for the release to be ready
+        :params known_releases - releases found on tiller, see list_charts
+        :params prefix - release prefix of the manifest
+        :params dependency_cache - dependency cache shared by ChartBuilders
+
+        Install or upgrade a single chart and return what was done to it:
+        'installed', 'upgraded', 'skipped' or None when the chart has no
+        release
+        '''
+        chart = dotify(gchart['chart'])
+        values = gchart.get('chart').get('values', {})
+        pre_actions = {}
+        post_actions = {}
+        LOG.info('%s', chart.release)
+
+        if chart.release is None:
+            return None
+
+        # retrieve appropriate timeout value if 'wait' is specified
+        chart_timeout = self.timeout
+        if chart_wait:
+            if chart_timeout == DEFAULT_TIMEOUT:
+                chart_timeout = getattr(chart, 'timeout',
+                                        chart_timeout)
+
+        start = time.time()
+        with self.phase('build', chart.release):
+            chartbuilder = ChartBuilder(
+                chart, dependency_cache=dependency_cache)
+            protoc_chart = chartbuilder.get_helm_chart()
+        self.notify('built', chart.release, start,
+                    size=chartbuilder.get_payload_sizes()['total'])
+        self.log_payload_sizes(chart, chartbuilder)
+
+        # tiller holds the install or upgrade until the release is ready
+        # when asked to wait, which then dominates the time of the call
+        rpc_phase = 'wait' if chart_wait else 'rpc'
+
+        # determine install or upgrade by examining known releases
+        LOG.debug("RELEASE: %s", chart.release)
+        deployed_releases = [x[0] for x in known_releases]
+        prefix_chart = release_prefix(prefix, chart.release)
+
+        if prefix_chart in deployed_releases:
+
+            # indicate to the end user what path we are taking
+            LOG.info("Upgrading release %s", chart.release)
+            # extract the installed chart and installed values from the
+            # latest release so we can compare to the intended state
+            LOG.info("Checking Pre/Post Actions")
+            apply_chart, apply_values = self.find_release_chart(
+                known_releases, prefix_chart)
+
+            LOG.info("Checking Pre/Post Actions")
+            upgrade = gchart.get('chart', {}).get('upgrade', False)
+
+            if upgrade:
+                if not self.disable_update_pre and upgrade.get(
+                        'pre', False):
+                    pre_actions = getattr(chart.upgrade, 'pre', {})
+
+                if not self.disable_update_post and upgrade.get(
+                        'post', False):
+                    post_actions = getattr(chart.upgrade, 'post', {})
+
+            # show delta for both the chart templates, files and
+            # the chart values
+
+            start = time.time()
+            with self.phase('diff', chart.release):
+                upgrade_diff = self.show_diff(chart, apply_chart,
+                                              apply_values,
+                                              chartbuilder.dump(), values)
+            self.notify('diffed', chart.release, start,
+                        changed=upgrade_diff)
+
+            if not upgrade_diff:
+                LOG.info("There are no updates found in this chart")
+                return 'skipped'
+
+            # do actual update
+            self.notify('upgrading', chart.release, time.time())
+            with self.phase(rpc_phase, chart.release):
+                self.tiller.update_release(protoc_chart,
+                                           prefix_chart,
+                                           chart.namespace,
+                                           pre_actions=pre_actions,
+                                           post_actions=post_actions,
+                                           dry_run=self.dry_run,
+                                           disable_hooks=chart.
+                                           upgrade.no_hooks,
+                                           values=yaml.safe_dump(values),
+                                           wait=chart_wait,
+                                           timeout=chart_timeout)
+            action = 'upgraded'
+
+        # process install
+        else:
+            LOG.info("Installing release %s", chart.release)
+            self.notify('installing', chart.release, time.time())
+            with self.phase(rpc_phase, chart.release):
+                self.tiller.install_release(protoc_chart,
+                                            prefix_chart,
+                                            chart.namespace,
+                                            dry_run=self.dry_run,
+                                            values=yaml.safe_dump(values),
+                                            wait=chart_wait,
+                                            timeout=chart_timeout)
+            action = 'installed'
+
+        LOG.debug("Cleaning up chart source in %s",
+                  chartbuilder.source_directory)
+
+        return action
 
     def post_flight_ops(self):
         '''
@@ -314,6 +492,38 @@ class Armada(object):
                 if ch.get('chart').get('source').get('type') == 'git':
                     source.source_cleanup(ch.get('chart').get('source_dir')[0])
 
+    def report_timeline(self):
+        '''
+        Log the slowest phases of sync and write the timeline files
+        '''
+        LOG.info("Slowest phases of the apply:")
+        LOG.info("%10s  %-10s  %s", 'SECONDS', 'PHASE', 'NAME')
+        for span in self.timeline.slowest(TIMELINE_REPORT_LIMIT):
+            LOG.info("%10.3f  %-10s  %s", span['duration'],
+                     span['category'], span['name'])
+
+        try:
+            self.timeline.write(self.timeline_file, self.chrome_trace_file)
+        except (IOError, OSError) as e:
+            LOG.error("Failed to write the apply timeline: %s", e)
+
+    def log_payload_sizes(self, chart, chartbuilder):
+        '''
+        Log how many bytes the chart sends to Tiller and the parts of the
+        chart contributing most of them
+        '''
+        sizes = chartbuilder.get_payload_sizes()
+        LOG.info("Chart %s is %d bytes: templates %d, values %d, files %d, "
+                 "dependencies %d", chart.release, sizes['total'],
+                 sizes['templates'], sizes['values'], sizes['files'],
+                 sizes['dependencies'])
+
+        LOG.info("Largest parts of chart %s:", chart.release)
+        LOG.info("%12s  %-10s  %s", 'BYTES', 'KIND', 'NAME')
+        for kind, name, size in chartbuilder.get_payload_contributors(
+                PAYLOAD_REPORT_LIMIT):
+            LOG.info("%12d  %-10s  %s", size, kind, name)
+
     def show_diff(self, chart, installed_chart, installed_values, target_chart,
                   target_values):
         '''
@@ -323,9 +533,16 @@ class Armada(object):
         unified diff output and avoid the use of print
         '''
 
-        chart_diff = list(
-            difflib.unified_diff(installed_chart.SerializeToString()
-                                 .split('\n'), target_chart.split('\n')))
+        # compare the parts of the charts by name, the order templates,
+        # files and dependencies are sent in does not change a release
+        installed = chart_documents(installed_chart)
+        target = chart_documents(Chart.FromString(target_chart))
+        chart_diff = []
+        for path in sorted(set(installed) | set(target)):
+            if installed.get(path) != target.get(path):
+                chart_diff.extend(difflib.unified_diff(
+                    installed.get(path, '').split('\n'),
+                    target.get(path, '').split('\n'), path, path))
         if len(chart_diff) > 0:
             LOG.info("Chart Unified Diff (%s)", chart.release)
             for line in chart_diff:
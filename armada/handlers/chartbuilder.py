@@ -12,24 +12,153 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import hashlib
 import os
 import yaml
 
+from concurrent import futures
+from google.protobuf.any_pb2 import Any
 from hapi.chart.template_pb2 import Template
 from hapi.chart.chart_pb2 import Chart
 from hapi.chart.metadata_pb2 import Metadata
 from hapi.chart.config_pb2 import Config
 from supermutes.dot import dotify
 
+from ..const import MAX_MESSAGE_LENGTH
 from ..exceptions import chartbuilder_exceptions
+from ..utils.helmignore import HelmIgnore
+from ..utils.tracing import traced
 
 from oslo_config import cfg
 from oslo_log import log as logging
 
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
 LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
+# number of threads reading chart files in parallel
+READ_WORKERS = 8
+
+# maximum number of files read by a thread in one batch
+READ_BATCH_SIZE = 32
+
+# warn when a chart grows beyond this share of the gRPC message limit
+PAYLOAD_WARNING_RATIO = 0.8
+
+# version control directories, never part of a chart whatever
+# .helmignore says, e.g. the .git of a chart cloned to its source root
+VCS_DIRECTORIES = ('.git', '.hg', '.svn')
+
+# paths of the chart directory that are not packed as chart files
+CHART_FILES_EXCLUDE = ('Chart.yaml', 'values.yaml', 'templates', 'charts')
+
+# wire format tags of the length delimited fields of hapi.chart.Chart
+CHART_FIELD_TAGS = {
+    'metadata': b'\x0a',
+    'templates': b'\x12',
+    'dependencies': b'\x1a',
+    'values': b'\x22',
+    'files': b'\x2a',
+}
+
+
+def read_file(path):
+    '''
+    Return the contents of a file, closing it before returning
+    '''
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def read_binary_file(path):
+    '''
+    Return the contents of a file as bytes
+    '''
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def encode_field(tag, data):
+    '''
+    :params tag - wire format tag of a length delimited field
+    :params data - serialized field value
+
+    Return the field encoded as protobuf wire format
+    '''
+    length = len(data)
+    prefix = bytearray(tag)
+    while length > 0x7f:
+        prefix.append(0x80 | (length & 0x7f))
+        length >>= 7
+    prefix.append(length)
+    return bytes(prefix) + data
+
+
+def digest(data):
+    '''
+    Return the hex sha256 digest of a string
+    '''
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def chart_documents(chart, prefix=''):
+    '''
+    :params chart - helm chart protobuf
+    :params prefix - path of the chart within its parent
+
+    Return the parts of a chart as a dict of path to contents. Templates,
+    files and dependencies are keyed by name, so charts differing only in
+    the order of their parts have equal documents.
+    '''
+    documents = {
+        prefix + 'Chart.yaml': str(chart.metadata),
+        prefix + 'values.yaml': chart.values.raw,
+    }
+    for template in chart.templates:
+        documents[prefix + 'templates/' + template.name] = template.data
+    for f in chart.files:
+        documents[prefix + f.type_url] = f.value
+    for dependency in chart.dependencies:
+        documents.update(chart_documents(
+            dependency, '%scharts/%s/' % (prefix, dependency.metadata.name)))
+    return documents
+
+
+def read_files(paths, max_workers=None, reader=read_file):
+    '''
+    :params paths - list of file paths
+    :params max_workers - maximum number of files read at the same time,
+                          defaults to READ_WORKERS
+    :params reader - function returning the contents of a path
+
+    Returns the contents of the files in the order of paths
+    '''
+    max_workers = max_workers or READ_WORKERS
+    if len(paths) < 2 or max_workers < 2:
+        return [reader(path) for path in paths]
+
+    # hand every thread a few batches, small enough to keep all threads
+    # busy and large enough that scheduling does not dominate
+    size = min(READ_BATCH_SIZE,
+               max(1, len(paths) // (max_workers * 4)))
+    batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+
+    contents = []
+    with futures.ThreadPoolExecutor(
+            max_workers=min(max_workers, len(batches))) as executor:
+        for batch in executor.map(
+                lambda batch: [reader(path) for path in batch], batches):
+            contents.extend(batch)
+    return contents
+
 
 class ChartBuilder(object):
     '''
@@ -41,18 +170,34 @@ class ChartBuilder(object):
     source from external resources where necessary
     '''
 
-    def __init__(self, chart, parent=None):
+    def __init__(self, chart, parent=None, dependency_cache=None):
         '''
         Initialize the ChartBuilder class
 
         Note that tthis will trigger a source pull as part of
         initialization as its necessary in order to examine
         the source service many of the calls on ChartBuilder
+
+        :params dependency_cache - dict shared between ChartBuilders so
+                                   every distinct dependency is built once
         '''
 
         # cache for generated protoc chart object
         self._helm_chart = None
 
+        # cache for the serialized chart
+        self._serialized = None
+
+        # cache for the digest tree of the chart
+        self._digests = None
+
+        # builders of the dependencies, shared with other charts using
+        # the same dependencies
+        self.dependency_cache = dependency_cache
+        if self.dependency_cache is None:
+            self.dependency_cache = {}
+        self.dependency_builders = []
+
         # record whether this is a dependency based chart
         self.parent = parent
 
@@ -64,6 +209,7 @@ class ChartBuilder(object):
 
         # load ignored files from .helmignore if present
         self.ignored_files = self.get_ignored_files()
+        self.ignore_rules = HelmIgnore(self.ignored_files)
 
     def get_source_path(self):
         '''
@@ -86,20 +232,15 @@ class ChartBuilder(object):
         except Exception:
             raise chartbuilder_exceptions.IgnoredFilesLoadException()
 
-    def ignore_file(self, filename):
+    def ignore_file(self, filename, is_dir=False):
         '''
-        :params file - filename to compare against list of ignored files
+        :params file - path relative to the chart directory
+        :params is_dir - whether the path is a directory
 
-        Returns true if file matches an ignored file wildcard or exact name,
-         false otherwise
+        Returns true if the path, or a directory containing it, matches
+        the .helmignore rules, false otherwise
         '''
-        for ignored_file in self.ignored_files:
-            if (ignored_file.startswith('*')
-                    and filename.endswith(ignored_file.strip('*'))):
-                return True
-            elif ignored_file == filename:
-                return True
-        return False
+        return self.ignore_rules.ignored(filename, is_dir=is_dir)
 
     def get_metadata(self):
         '''
@@ -125,9 +266,25 @@ class ChartBuilder(object):
         '''
         Return (non-template) files in this chart
 
-        TODO(alanmeadows): Not implemented
+        Like helm, every file of the chart directory except Chart.yaml,
+        values.yaml, templates/ and charts/ is packed as an Any message
+        named after its path relative to the chart directory
         '''
-        return []
+        files = sorted(
+            (os.path.relpath(path, self.source_directory), path)
+            for path in self.walk_files('', exclude=CHART_FILES_EXCLUDE))
+
+        contents = read_files([path for _, path in files],
+                              reader=read_binary_file)
+
+        size = sum(len(data) for data in contents)
+        if size > MAX_MESSAGE_LENGTH * PAYLOAD_WARNING_RATIO:
+            LOG.warn("Files of chart %s add up to %d bytes, close to the "
+                     "Tiller message limit of %d bytes",
+                     self.chart.chart_name, size, MAX_MESSAGE_LENGTH)
+
+        return [Any(type_url=name.replace(os.sep, '/'), value=data)
+                for (name, _), data in zip(files, contents)]
 
     def get_values(self):
         '''
@@ -152,28 +309,62 @@ class ChartBuilder(object):
 
         # process all files in templates/ as a template to attach to the chart
         # building a Template object
-        templates = []
-        if not os.path.exists(
-                os.path.join(self.source_directory, 'templates')):
+        templates_dir = os.path.join(self.source_directory, 'templates')
+        if not os.path.exists(templates_dir):
             LOG.warn("Chart %s has no templates directory. "
                      "No templates will be deployed", self.chart.chart_name)
-        for root, _, files in os.walk(
-                os.path.join(self.source_directory, 'templates'),
-                topdown=True):
-            for tpl_file in files:
-                tname = os.path.relpath(
-                    os.path.join(root, tpl_file),
-                    os.path.join(self.source_directory, 'templates'))
-                if self.ignore_file(tname):
-                    LOG.debug('Ignoring file %s', tname)
-                    continue
+            return []
+        elif self.ignore_file('templates', is_dir=True):
+            LOG.debug('Ignoring directory templates')
+            return []
 
-                templates.append(
-                    Template(
-                        name=tname,
-                        data=open(os.path.join(root, tpl_file), 'r').read()))
-        return templates
+        # template names are relative to templates/, sorting them keeps
+        # the chart and its serialized form stable between runs
+        files = sorted(
+            (os.path.relpath(path, templates_dir), path)
+            for path in self.walk_files('templates'))
 
+        contents = read_files([path for _, path in files])
+
+        return [Template(name=tname, data=data)
+                for (tname, _), data in zip(files, contents)]
+
+    def walk_files(self, directory, exclude=()):
+        '''
+        :params directory - directory relative to the chart directory,
+                            '' for the chart directory itself
+        :params exclude - paths relative to the chart directory to skip
+
+        Yields the paths of the files below directory that are not ignored
+        by .helmignore. Ignored and VCS_DIRECTORIES directories are pruned
+        without being read and, like os.walk, symlinks to directories are
+        not followed.
+        '''
+        pending = [directory]
+        while pending:
+            # .helmignore paths are relative to the chart directory
+            rel_root = pending.pop()
+            for entry in scandir(
+                    os.path.join(self.source_directory, rel_root)):
+                if rel_root:
+                    rel_path = rel_root + '/' + entry.name
+                else:
+                    rel_path = entry.name
+                if rel_path in exclude:
+                    continue
+                if entry.is_dir():
+                    if entry.is_symlink() or entry.name in VCS_DIRECTORIES:
+                        continue
+                    if self.ignore_rules.match(rel_path, is_dir=True):
+                        LOG.debug('Ignoring directory %s', rel_path)
+                        continue
+                    pending.append(rel_path)
+                elif self.ignore_rules.match(rel_path):
+                    LOG.debug('Ignoring file %s', rel_path)
+                else:
+                    yield entry.path
+
+    @traced('ChartBuilder.get_helm_chart')
     def get_helm_chart(self):
         '''
         Return a helm chart object
@@ -184,14 +375,15 @@ class ChartBuilder(object):
         # dependencies
         # [process_chart(x, is_dependency=True) for x in chart.dependencies]
         dependencies = []
+        self.dependency_builders = []
         for dep in self.chart.dependencies:
-            LOG.info("Building dependency chart %s for release %s",
-                     self.chart.chart_name, self.chart.release)
             try:
-                dependencies.append(ChartBuilder(dep.chart).get_helm_chart())
+                builder = self.get_dependency_builder(dep.chart)
+                dependencies.append(builder.get_helm_chart())
             except Exception:
                 chart_name = self.chart.chart_name
                 raise chartbuilder_exceptions.DependencyException(chart_name)
+            self.dependency_builders.append(builder)
 
         try:
             helm_chart = Chart(
@@ -199,19 +391,173 @@ class ChartBuilder(object):
                 templates=self.get_templates(),
                 dependencies=dependencies,
                 values=self.get_values(),
-                files=self.get_files())
+                files=self.get_files() if self.chart.get('pack_files')
+                else [])
         except Exception:
             chart_name = self.chart.chart_name
             raise chartbuilder_exceptions.HelmChartBuildException(chart_name)
 
+        if self.parent is None:
+            size = helm_chart.ByteSize()
+            if size > MAX_MESSAGE_LENGTH * PAYLOAD_WARNING_RATIO:
+                LOG.warn("Chart %s is %d bytes, close to the Tiller message "
+                         "limit of %d bytes", self.chart.chart_name, size,
+                         MAX_MESSAGE_LENGTH)
+
         self._helm_chart = helm_chart
         return helm_chart
 
-    def dump(self):
+    @staticmethod
+    def get_dependency_key(chart):
+        '''
+        Return a key identifying the chart built from a dependency
+        definition, its source directory and those of its dependencies
+        '''
+        source_dir = os.path.normpath(os.path.join(*chart.source_dir))
+        return (source_dir, tuple(
+            ChartBuilder.get_dependency_key(dep.chart)
+            for dep in chart.get('dependencies') or []))
+
+    def get_dependency_builder(self, chart):
+        '''
+        :params chart - dependency chart definition
+
+        Return the ChartBuilder of a dependency, reusing the builder of
+        an identical dependency of another chart
+        '''
+        key = self.get_dependency_key(chart)
+        builder = self.dependency_cache.get(key)
+        if builder is None:
+            LOG.info("Building dependency chart %s of chart %s",
+                     chart.chart_name, self.chart.chart_name)
+            builder = ChartBuilder(chart, parent=self,
+                                   dependency_cache=self.dependency_cache)
+            self.dependency_cache[key] = builder
+        else:
+            LOG.debug("Reusing dependency chart %s of chart %s",
+                      chart.chart_name, self.chart.chart_name)
+        return builder
+
+    def get_payload_sizes(self):
+        '''
+        Return the serialized size in bytes of each part of the chart
+        '''
+        helm_chart = self.get_helm_chart()
+        return {
+            'metadata': helm_chart.metadata.ByteSize(),
+            'templates': sum(t.ByteSize() for t in helm_chart.templates),
+            'values': helm_chart.values.ByteSize(),
+            'files': sum(f.ByteSize() for f in helm_chart.files),
+            'dependencies': sum(
+                d.ByteSize() for d in helm_chart.dependencies),
+            'total': helm_chart.ByteSize(),
+        }
+
+    def get_payload_contributors(self, limit=None):
+        '''
+        :params limit - maximum number of contributors to return
+
+        Return (kind, name, bytes) tuples for every template, file, the
+        values and every dependency of the chart, biggest first
+        '''
+        helm_chart = self.get_helm_chart()
+        contributors = [('values', 'values.yaml',
+                         helm_chart.values.ByteSize())]
+        contributors.extend(('template', t.name, t.ByteSize())
+                            for t in helm_chart.templates)
+        contributors.extend(('file', f.type_url, f.ByteSize())
+                            for f in helm_chart.files)
+        contributors.extend(('dependency', d.metadata.name, d.ByteSize())
+                            for d in helm_chart.dependencies)
+
+        contributors.sort(key=lambda c: c[2], reverse=True)
+        return contributors[:limit]
+
+    def get_digests(self):
+        '''
+        Return the digest tree of the chart
+
+        The tree holds the sha256 digests of the metadata, the values and
+        of every template and file, the trees of the dependencies and a
+        Merkle root covering all of them. Two charts have the same root
+        exactly when they carry the same content.
+        '''
+        if self._digests is not None:
+            return self._digests
+
+        helm_chart = self.get_helm_chart()
+
+        digests = collections.OrderedDict()
+        digests['name'] = helm_chart.metadata.name
+        digests['metadata'] = digest(helm_chart.metadata.SerializeToString())
+        digests['values'] = digest(helm_chart.values.raw)
+        digests['templates'] = collections.OrderedDict(
+            (t.name, digest(t.data)) for t in helm_chart.templates)
+        digests['files'] = collections.OrderedDict(
+            (f.type_url, digest(f.value)) for f in helm_chart.files)
+        digests['dependencies'] = [
+            builder.get_digests() for builder in self.dependency_builders]
+
+        # names are part of the nodes, so renaming a template changes the
+        # root even when its content stays the same
+        nodes = ['metadata %s' % digests['metadata'],
+                 'values %s' % digests['values']]
+        nodes.extend('template %s %s' % item
+                     for item in digests['templates'].items())
+        nodes.extend('file %s %s' % item
+                     for item in digests['files'].items())
+        nodes.extend('dependency %s' % dep['root']
+                     for dep in digests['dependencies'])
+        digests['root'] = digest('\n'.join(nodes))
+
+        self._digests = digests
+        return digests
+
+    def dump(self, with_digests=False):
         '''
         This method is used to dump a chart object as a
         serialized string so that we can perform a diff
 
         It should recurse into dependencies
+
+        Dependencies are serialized once and their bytes spliced into the
+        serialized form of every chart using them. Fields are written in
+        field number order, so the result is identical to
+        SerializeToString.
+
+        :params with_digests - return a tuple of the serialized chart and
+                               its digest tree, see get_digests
         '''
-        return self.get_helm_chart().SerializeToString()
+        if with_digests:
+            return self.dump(), self.get_digests()
+
+        if self._serialized is not None:
+            return self._serialized
+
+        helm_chart = self.get_helm_chart()
+        if not self.dependency_builders:
+            self._serialized = helm_chart.SerializeToString()
+            return self._serialized
+
+        parts = []
+        if helm_chart.HasField('metadata'):
+            parts.append(encode_field(
+                CHART_FIELD_TAGS['metadata'],
+                helm_chart.metadata.SerializeToString()))
+        parts.extend(
+            encode_field(CHART_FIELD_TAGS['templates'],
+                         template.SerializeToString())
+            for template in helm_chart.templates)
+        parts.extend(
+            encode_field(CHART_FIELD_TAGS['dependencies'], builder.dump())
+            for builder in self.dependency_builders)
+        if helm_chart.HasField('values'):
+            parts.append(encode_field(
+                CHART_FIELD_TAGS['values'],
+                helm_chart.values.SerializeToString()))
+        parts.extend(
+            encode_field(CHART_FIELD_TAGS['files'], f.SerializeToString())
+            for f in helm_chart.files)
+
+        self._serialized = b''.join(parts)
+        return self._serialized
@@ -0,0 +1,343 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import re
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+
+# server side timeout of a single watch request, the watch is
+# restarted from the last seen resource version when it expires
+WATCH_TIMEOUT = 300
+
+# delay before listing again after a failed watch, doubled with every
+# further failure up to MAX_RELIST_DELAY
+RELIST_DELAY = 5
+MAX_RELIST_DELAY = 300
+
+# seconds the cache is served after its watch failed, callers list
+# directly once it is older
+MAX_STALENESS = 30
+
+# watch errors retrying does not fix, e.g. missing watch permission
+FATAL_WATCH_STATUS = (401, 403)
+
+SELECTOR_SET = re.compile(r'^([^\s!=]+)\s+(in|notin)\s+\((.*)\)$')
+SELECTOR_EQUALITY = re.compile(r'^([^\s!=]+)\s*(==|=|!=)\s*([^\s!=]*)$')
+SELECTOR_EXISTS = re.compile(r'^(!?)\s*([^\s!=]+)$')
+
+
+def parse_label_selector(label_selector):
+    '''
+    :params label_selector - kubernetes label selector string
+
+    Returns a list of (key, operator, values) requirements, where operator
+    is one of 'in', 'notin', 'exists' or '!exists'. Equality operators are
+    normalized to 'in' and 'notin' with a single value.
+
+    Raises ValueError on a selector this parser does not understand.
+    '''
+    requirements = []
+    if not label_selector:
+        return requirements
+
+    # split on commas that are not part of a set based value list
+    terms = []
+    depth = 0
+    term = ''
+    for c in label_selector:
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        if c == ',' and depth == 0:
+            terms.append(term)
+            term = ''
+        else:
+            term += c
+    terms.append(term)
+
+    for term in terms:
+        term = term.strip()
+        if not term:
+            continue
+
+        match = SELECTOR_SET.match(term)
+        if match:
+            key, op, values = match.groups()
+            requirements.append(
+                (key, op, set(v.strip() for v in values.split(','))))
+            continue
+
+        match = SELECTOR_EQUALITY.match(term)
+        if match:
+            key, op, value = match.groups()
+            op = 'notin' if op == '!=' else 'in'
+            requirements.append((key, op, set([value])))
+            continue
+
+        match = SELECTOR_EXISTS.match(term)
+        if match:
+            negate, key = match.groups()
+            op = '!exists' if negate else 'exists'
+            requirements.append((key, op, set()))
+            continue
+
+        raise ValueError('Unsupported label selector: %s' % label_selector)
+
+    return requirements
+
+
+class Informer(object):
+    '''
+    Local cache of one resource kind in one namespace
+
+    The cache is filled with a single LIST call and then kept up to date
+    by a WATCH running in a background thread. Objects are indexed by
+    label key and value so that label selector queries are answered
+    without a round trip to the Kubernetes API server.
+
+    The cache is only synced while the watch works. Once it fails the
+    cache may be served for MAX_STALENESS more seconds, see is_synced.
+    '''
+
+    def __init__(self, list_func, namespace, clock=time.time):
+        '''
+        :params list_func - namespaced list call of a kubernetes api client
+        :params namespace - namespace to cache
+        :params clock - callable returning the current time in seconds
+        '''
+        self.list_func = list_func
+        self.namespace = namespace
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._objects = {}
+        self._index = {}
+        self._list_type = None
+        self._resource_version = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+        # whether the watch is following changes, the last time the
+        # cache was confirmed current and the watch failures in a row
+        self._synced = False
+        self._synced_at = None
+        self._failures = 0
+
+    def start(self):
+        '''
+        Perform the initial LIST and start watching for changes
+        '''
+        if self._thread is not None:
+            return
+
+        # a failed initial list leaves the informer unstarted so the
+        # next caller tries again
+        self._relist()
+
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                name='informer-%s-%s' % (self.list_func.__name__,
+                                         self.namespace))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        '''
+        Stop watching, the watch thread exits after its current request
+        '''
+        self._stopped.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_synced(self):
+        '''
+        Return whether the cache may answer queries
+
+        While the watch works every event and every expired watch request
+        confirms the cache. After a failed watch the cache is only served
+        until it is MAX_STALENESS seconds old.
+        '''
+        if not self.is_alive():
+            return False
+
+        with self._lock:
+            if self._synced_at is None:
+                return False
+            max_age = MAX_STALENESS
+            if self._synced:
+                max_age += WATCH_TIMEOUT
+            return self.clock() - self._synced_at <= max_age
+
+    def list(self, label_selector=''):
+        '''
+        :params label_selector - filters objects by label
+
+        Returns a list response of the same type the API server returns
+        for the cached resource, containing copies of the matching objects
+        '''
+        requirements = parse_label_selector(label_selector)
+
+        with self._lock:
+            names = None
+            for key, op, values in requirements:
+                if op != 'in':
+                    continue
+                by_value = self._index.get(key, {})
+                matched = set()
+                for value in values:
+                    matched |= by_value.get(value, set())
+                names = matched if names is None else names & matched
+
+            if names is None:
+                names = self._objects.keys()
+
+            items = []
+            for name in sorted(names):
+                obj = self._objects[name]
+                if self._matches(obj, requirements):
+                    items.append(obj)
+
+        # callers may modify the objects, keep the cached ones intact
+        return self._list_type(items=copy.deepcopy(items))
+
+    def _matches(self, obj, requirements):
+        labels = obj.metadata.labels or {}
+        for key, op, values in requirements:
+            if op == 'in' and labels.get(key) not in values:
+                return False
+            elif op == 'notin' and labels.get(key) in values:
+                return False
+            elif op == 'exists' and key not in labels:
+                return False
+            elif op == '!exists' and key in labels:
+                return False
+        return True
+
+    def _relist(self):
+        resp = self.list_func(self.namespace)
+
+        with self._lock:
+            self._objects = {}
+            self._index = {}
+            for obj in resp.items:
+                self._add(obj)
+            self._list_type = type(resp)
+            self._resource_version = resp.metadata.resource_version
+            self._synced = True
+            self._synced_at = self.clock()
+
+    def _add(self, obj):
+        name = obj.metadata.name
+        self._remove(name)
+        self._objects[name] = obj
+        for key, value in (obj.metadata.labels or {}).items():
+            self._index.setdefault(key, {}).setdefault(value, set()).add(name)
+
+    def _remove(self, name):
+        obj = self._objects.pop(name, None)
+        if obj is None:
+            return
+        for key, value in (obj.metadata.labels or {}).items():
+            names = self._index.get(key, {}).get(value, set())
+            names.discard(name)
+            if not names:
+                self._index[key].pop(value, None)
+
+    def _handle_event(self, event):
+        '''
+        :params event - event dict produced by a kubernetes watch
+
+        Returns False if the watch has to be restarted from a fresh list
+        '''
+        if event['type'] == 'ERROR':
+            return False
+
+        obj = event['object']
+        with self._lock:
+            if event['type'] == 'DELETED':
+                self._remove(obj.metadata.name)
+            else:
+                self._add(obj)
+            self._resource_version = obj.metadata.resource_version
+            self._synced_at = self.clock()
+            self._failures = 0
+
+        return True
+
+    def _run(self):
+        from kubernetes import watch
+        from kubernetes.client.rest import ApiException
+
+        while not self._stopped.is_set():
+            try:
+                w = watch.Watch()
+                for event in w.stream(self.list_func, self.namespace,
+                                      resource_version=self._resource_version,
+                                      timeout_seconds=WATCH_TIMEOUT):
+                    if self._stopped.is_set():
+                        w.stop()
+                    elif not self._handle_event(event):
+                        w.stop()
+                        self._relist()
+
+                # the watch request expired, the cache is still current
+                with self._lock:
+                    self._synced_at = self.clock()
+                    self._failures = 0
+            except ApiException as e:
+                if e.status in FATAL_WATCH_STATUS:
+                    LOG.warn('Cannot watch %s in %s, listing directly: %s',
+                             self.list_func.__name__, self.namespace, e)
+                    self._watch_failed()
+                    self.stop()
+                    return
+                LOG.debug('Watch on %s in %s failed, relisting: %s',
+                          self.list_func.__name__, self.namespace, e)
+                self._safe_relist(self._watch_failed())
+            except Exception as e:
+                LOG.warn('Watch on %s in %s failed, relisting: %s',
+                         self.list_func.__name__, self.namespace, e)
+                self._safe_relist(self._watch_failed())
+
+    def _watch_failed(self):
+        '''
+        Mark the cache unsynced and return the delay before relisting
+        '''
+        with self._lock:
+            self._synced = False
+            self._failures += 1
+            return min(RELIST_DELAY * 2 ** (self._failures - 1),
+                       MAX_RELIST_DELAY)
+
+    def _safe_relist(self, delay):
+        if self._stopped.wait(delay):
+            return
+        try:
+            self._relist()
+        except Exception as e:
+            LOG.warn('Could not list %s in %s: %s',
+                     self.list_func.__name__, self.namespace, e)
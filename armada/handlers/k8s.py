@@ -13,8 +13,11 @@
 # limitations under the License.
 
 import re
-from kubernetes import client, config, watch
-from kubernetes.client.rest import ApiException
+import threading
+
+from informer import Informer
+
+from ..utils.tracing import traced
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -23,47 +26,134 @@ LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
+# api clients are created on first use and shared by every K8s object
+# in the process, the kubernetes package itself is only imported then
+_api_clients = {}
+_api_clients_lock = threading.Lock()
+
+# informers are shared by every K8s object in the process, keyed by
+# the list call name and namespace they cache
+_informers = {}
+_informers_lock = threading.Lock()
+
+
+def get_api_client(api_name):
+    '''
+    :params api_name - class name of a kubernetes api client
+
+    Return the shared instance of an api client class, loading the
+    kube config the first time any client is requested
+    '''
+    from kubernetes import client, config
+
+    with _api_clients_lock:
+        if not _api_clients:
+            config.load_kube_config()
+
+        api = _api_clients.get(api_name)
+        if api is None:
+            api = getattr(client, api_name)()
+            _api_clients[api_name] = api
+
+        return api
+
 
 class K8s(object):
     '''
     Object to obtain the local kube config file
     '''
 
-    def __init__(self):
+    def __init__(self, use_cache=True):
         '''
         Initialize connection to Kubernetes
+
+        The kube config is only loaded once an api client is first used
+
+        :params use_cache - serve namespaced pod, job and daemonset
+                            queries from a local watch based cache
+        '''
+        self.use_cache = use_cache
+
+    @property
+    def client(self):
+        return get_api_client('CoreV1Api')
+
+    @property
+    def batch_api(self):
+        return get_api_client('BatchV1Api')
+
+    @property
+    def extension_api(self):
+        return get_api_client('ExtensionsV1beta1Api')
+
+    def _get_informer(self, list_func, namespace):
         '''
-        config.load_kube_config()
+        Return the started informer for a list call and namespace
+        '''
+        key = (list_func.__name__, namespace)
+        with _informers_lock:
+            informer = _informers.get(key)
+            if informer is None:
+                informer = Informer(list_func, namespace)
+                _informers[key] = informer
+
+        informer.start()
+        return informer
 
-        self.client = client.CoreV1Api()
-        self.batch_api = client.BatchV1Api()
-        self.extension_api = client.ExtensionsV1beta1Api()
+    def _list_namespaced(self, list_func, namespace, label_selector):
+        '''
+        :params list_func - namespaced list call of a kubernetes api client
+        :params namespace - namespace of the resources
+        :params label_selector - filters resources by label
 
+        Serve the query from the informer cache, falling back to a
+        direct LIST call when the cache cannot answer it or is stale
+        '''
+        if self.use_cache:
+            try:
+                informer = self._get_informer(list_func, namespace)
+                if informer.is_synced():
+                    return informer.list(label_selector)
+            except ValueError as e:
+                LOG.debug('Bypassing cache: %s', e)
+            except Exception as e:
+                LOG.warn('Resource cache unavailable for %s in %s: %s',
+                         list_func.__name__, namespace, e)
+
+        return list_func(namespace, label_selector=label_selector)
+
+    @traced('K8s.delete_job_action')
     def delete_job_action(self, name, namespace="default"):
         '''
         :params name - name of the job
         :params namespace - name of pod that job
         '''
+        from kubernetes.client import V1DeleteOptions
+        from kubernetes.client.rest import ApiException
+
         try:
-            body = client.V1DeleteOptions()
+            body = V1DeleteOptions()
             self.batch_api.delete_namespaced_job(
                 name=name, namespace=namespace, body=body)
         except ApiException as e:
             LOG.error("Exception when deleting a job: %s", e)
 
+    @traced('K8s.get_namespace_job')
     def get_namespace_job(self, namespace="default",
                           label_selector=''):
         '''
         :params lables - of the job
         :params namespace - name of jobs
         '''
+        from kubernetes.client.rest import ApiException
 
         try:
-            return self.batch_api.list_namespaced_job(
-                namespace, label_selector=label_selector)
+            return self._list_namespaced(
+                self.batch_api.list_namespaced_job, namespace, label_selector)
         except ApiException as e:
             LOG.error("Exception getting a job: %s", e)
 
+    @traced('K8s.create_job_action')
     def create_job_action(self, name, namespace="default"):
         '''
         :params name - name of the job
@@ -71,6 +161,7 @@ class K8s(object):
         '''
         LOG.debug(" %s in namespace: %s", name, namespace)
 
+    @traced('K8s.get_namespace_pod')
     def get_namespace_pod(self, namespace="default",
                           label_selector=''):
         '''
@@ -80,9 +171,10 @@ class K8s(object):
         This will return a list of objects req namespace
         '''
 
-        return self.client.list_namespaced_pod(
-            namespace, label_selector=label_selector)
+        return self._list_namespaced(
+            self.client.list_namespaced_pod, namespace, label_selector)
 
+    @traced('K8s.get_all_pods')
     def get_all_pods(self, label_selector=''):
         '''
         :params label_selector - filters Pods by label
@@ -93,14 +185,16 @@ class K8s(object):
         return self.client.list_pod_for_all_namespaces(
             label_selector=label_selector)
 
+    @traced('K8s.get_namespace_daemonset')
     def get_namespace_daemonset(self, namespace='default', label=''):
         '''
         :param namespace - namespace of target deamonset
         :param labels - specify targeted daemonset
         '''
-        return self.extension_api.list_namespaced_daemon_set(
-            namespace, label_selector=label)
+        return self._list_namespaced(
+            self.extension_api.list_namespaced_daemon_set, namespace, label)
 
+    @traced('K8s.create_daemon_action')
     def create_daemon_action(self, namespace, template):
         '''
         :param - namespace - pod namespace
@@ -111,19 +205,22 @@ class K8s(object):
         self.extension_api.create_namespaced_daemon_set(
             namespace, body=template)
 
+    @traced('K8s.delete_daemon_action')
     def delete_daemon_action(self, name, namespace="default", body=None):
         '''
         :params - namespace - pod namespace
 
         This will delete daemonset
         '''
+        from kubernetes.client import V1DeleteOptions
 
         if body is None:
-            body = client.V1DeleteOptions()
+            body = V1DeleteOptions()
 
         return self.extension_api.delete_namespaced_daemon_set(
             name, namespace, body)
 
+    @traced('K8s.delete_namespace_pod')
     def delete_namespace_pod(self, name, namespace="default", body=None):
         '''
         :params name - name of the Pod
@@ -132,17 +229,21 @@ class K8s(object):
 
         Deletes pod by name and returns V1Status object
         '''
+        from kubernetes.client import V1DeleteOptions
+
         if body is None:
-            body = client.V1DeleteOptions()
+            body = V1DeleteOptions()
 
         return self.client.delete_namespaced_pod(
             name, namespace, body)
 
+    @traced('K8s.wait_for_pod_redeployment')
     def wait_for_pod_redeployment(self, old_pod_name, namespace):
         '''
         :param old_pod_name - name of pods
         :param namespace - kubernetes namespace
         '''
+        from kubernetes import watch
 
         base_pod_pattern = re.compile('^(.+)-[a-zA-Z0-9]+$')
 
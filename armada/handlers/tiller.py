@@ -12,18 +12,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import contextlib
+import copy
+import time
+import uuid
+
 import grpc
-import yaml
+
+from concurrent import futures
 
 from hapi.services.tiller_pb2 import ReleaseServiceStub, ListReleasesRequest, \
     InstallReleaseRequest, UpdateReleaseRequest, UninstallReleaseRequest
 from hapi.chart.config_pb2 import Config
 
 from k8s import K8s
-from ..const import STATUS_DEPLOYED, STATUS_FAILED
+from ..const import STATUS_DEPLOYED, STATUS_FAILED, MAX_MESSAGE_LENGTH
 
 from ..exceptions import tiller_exceptions
+from ..utils import metrics
+from ..utils.manifest_index import ManifestIndex
 from ..utils.release import release_prefix
+from ..utils.timeline import Timeline
+from ..utils import tracing
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -33,17 +44,72 @@ TILLER_VERSION = b'2.5.0'
 TILLER_TIMEOUT = 300
 RELEASE_LIMIT = 64
 
-# the standard gRPC max message size is 4MB
-# this expansion comes at a performance penalty
-# but until proper paging is supported, we need
-# to support a larger payload as the current
-# limit is exhausted with just 10 releases
-MAX_MESSAGE_LENGTH = 429496729
+# compression algorithm for install and update requests, which carry
+# whole charts, None to send them uncompressed
+COMPRESSION = 'gzip'
+
+# host:port of the Tillers that rejected compressed requests, shared by
+# every Tiller object of the process so the fallback happens once
+_uncompressed_targets = set()
+
+# longest release name Tiller accepts
+MAX_RELEASE_NAME = 53
+
+# number of releases uninstalled at the same time
+UNINSTALL_WORKERS = 8
 
 LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
+TILLER_RPCS = metrics.counter(
+    'armada_tiller_rpcs_total', 'Tiller RPCs by method and status code.',
+    ['method', 'status'])
+TILLER_RPC_DURATION = metrics.histogram(
+    'armada_tiller_rpc_duration_seconds', 'Duration of Tiller RPCs.',
+    ['method'])
+TILLER_SENT_BYTES = metrics.counter(
+    'armada_tiller_sent_bytes_total',
+    'Bytes of requests sent to Tiller, before compression.', ['method'])
+
+
+@contextlib.contextmanager
+def observe_rpc(method, request=None, timeline=None):
+    '''
+    :params method - name of the release service method
+    :params request - request sent to Tiller, counted in the sent bytes
+    :params timeline - Timeline to record the RPC in
+
+    Count and time the Tiller RPC made in the with block
+    '''
+    size = 0
+    if request is not None:
+        size = request.ByteSize()
+        TILLER_SENT_BYTES.inc(size, method=method)
+    release = getattr(request, 'name', None)
+
+    status = 'OK'
+    start = time.time()
+    with tracing.span('Tiller.' + method, release=release) as span:
+        try:
+            yield
+        except grpc.RpcError as e:
+            status = e.code().name
+            raise
+        except Exception:
+            status = 'UNKNOWN'
+            raise
+        finally:
+            end = time.time()
+            TILLER_RPC_DURATION.observe(end - start, method=method)
+            TILLER_RPCS.inc(method=method, status=status)
+            if timeline is not None:
+                timeline.add(method, 'rpc', start, end, status=status,
+                             release=release)
+            if span is not None:
+                span.set_attribute('rpc.status', status)
+                span.set_attribute('rpc.request_bytes', size)
+
 
 class Tiller(object):
     '''
@@ -51,15 +117,22 @@ class Tiller(object):
     service over gRPC
     '''
 
-    def __init__(self, tiller_host=None, tiller_port=TILLER_PORT):
+    def __init__(self, tiller_host=None, tiller_port=TILLER_PORT,
+                 compression=COMPRESSION):
 
         self.tiller_host = tiller_host
         self.tiller_port = tiller_port
+        self.compression = compression
+
+        # RPCs and waits, shared with Armada during an apply
+        self.timeline = Timeline()
         # init k8s connectivity
         self.k8s = K8s()
 
         # init tiller channel
         self.channel = self.get_channel()
+        if self.target in _uncompressed_targets:
+            self.compression = None
 
         # init timeout for all requests
         # and assume eventually this will
@@ -73,15 +146,50 @@ class Tiller(object):
         '''
         return [(b'x-helm-api-client', TILLER_VERSION)]
 
+    @property
+    def compressed_metadata(self):
+        '''
+        Return tiller metadata for requests that should be compressed
+        '''
+        if not self.compression:
+            return self.metadata
+        return self.metadata + [
+            (b'grpc-internal-encoding-request', self.compression)]
+
+    def _send_chart(self, rpc, request):
+        '''
+        :params rpc - stub method to call
+        :params request - request carrying a chart
+
+        Send a request with compression enabled. Tillers built without a
+        decompressor answer UNIMPLEMENTED, in which case compression is
+        disabled for that Tiller and the request is sent again
+        uncompressed.
+        '''
+        try:
+            return rpc(request, self.timeout,
+                       metadata=self.compressed_metadata)
+        except grpc.RpcError as e:
+            if not self.compression or \
+                    e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                raise
+            LOG.warn("Tiller does not accept %s compressed requests, "
+                     "sending requests uncompressed", self.compression)
+            self.compression = None
+            _uncompressed_targets.add(self.target)
+
+        return rpc(request, self.timeout, metadata=self.metadata)
+
     def get_channel(self):
         '''
         Return a tiller channel
         '''
         tiller_ip = self._get_tiller_ip()
         tiller_port = self._get_tiller_port()
+        self.target = '%s:%s' % (tiller_ip, tiller_port)
         try:
             return grpc.insecure_channel(
-                '%s:%s' % (tiller_ip, tiller_port),
+                self.target,
                 options=[
                     ('grpc.max_send_message_length', MAX_MESSAGE_LENGTH),
                     ('grpc.max_receive_message_length', MAX_MESSAGE_LENGTH)
@@ -110,8 +218,8 @@ class Tiller(object):
             return pod.status.pod_ip
 
     def _get_tiller_port(self):
-        '''Stub method to support arbitrary ports in the future'''
-        return TILLER_PORT
+        '''Return the port Tiller listens on'''
+        return self.tiller_port
 
     def tiller_status(self):
         '''
@@ -125,46 +233,91 @@ class Tiller(object):
     def list_releases(self):
         '''
         List Helm Releases
+
+        Tiller answers with up to RELEASE_LIMIT releases and the name of
+        the release to continue from, pages are requested until none is
+        left.
         '''
         releases = []
         stub = ReleaseServiceStub(self.channel)
-        req = ListReleasesRequest(limit=RELEASE_LIMIT,
-                                  status_codes=[STATUS_DEPLOYED,
-                                                STATUS_FAILED],
-                                  sort_by='LAST_RELEASED',
-                                  sort_order='DESC')
-        release_list = stub.ListReleases(req, self.timeout,
-                                         metadata=self.metadata)
-
-        for y in release_list:
-            releases.extend(y.releases)
-
-        return releases
-
-    def get_chart_templates(self, template_name, name, release_name, namespace,
-                            chart, disable_hooks, values):
-        # returns some info
-
-        LOG.info("Template( %s ) : %s ", template_name, name)
+        offset = ''
+        while True:
+            req = ListReleasesRequest(limit=RELEASE_LIMIT,
+                                      offset=offset,
+                                      status_codes=[STATUS_DEPLOYED,
+                                                    STATUS_FAILED],
+                                      sort_by='LAST_RELEASED',
+                                      sort_order='DESC')
+            offset = ''
+            with observe_rpc('ListReleases', req, self.timeline):
+                release_list = stub.ListReleases(req, self.timeout,
+                                                 metadata=self.metadata)
+
+                for y in release_list:
+                    releases.extend(y.releases)
+                    offset = y.next or offset
+
+            if not offset:
+                return releases
+
+    def get_rendered_manifest(self, release_name, namespace, chart,
+                              values):
+        '''
+        :params release_name - release the chart is rendered for
+        :params namespace - namespace the chart is rendered in
+        :params chart - helm chart protobuf
+        :params values - Config protobuf of the release values
+
+        Render the chart with an install dry run and return a ManifestIndex
+        of its documents. Tiller rejects a dry run named after a release in
+        use, the chart is rendered under a unique name derived from the
+        release instead.
+        '''
+        suffix = '-render-' + uuid.uuid4().hex[:8]
+        render_name = release_name[:MAX_RELEASE_NAME - len(suffix)].rstrip(
+            '-') + suffix
 
+        LOG.info("Rendering release %s as %s in namespace %s", release_name,
+                 render_name, namespace)
         stub = ReleaseServiceStub(self.channel)
         release_request = InstallReleaseRequest(
             chart=chart,
             dry_run=True,
             values=values,
-            name=name,
+            name=render_name,
             namespace=namespace,
             wait=False)
 
-        templates = stub.InstallRelease(
-            release_request, self.timeout, metadata=self.metadata)
+        with observe_rpc('InstallRelease', release_request, self.timeline):
+            rendered = self._send_chart(stub.InstallRelease, release_request)
+
+        return ManifestIndex(getattr(rendered.release, 'manifest', ''))
+
+    def get_chart_templates(self, template_name, name, release_name, namespace,
+                            chart, disable_hooks, values, kind=None,
+                            manifest=None):
+        '''
+        :params template_name - metadata.name of the rendered document
+        :params kind - kind of the rendered document, any kind when None
+        :params manifest - ManifestIndex of the release, rendered when not
+                           given
+
+        Return a copy of a document of the rendered release manifest, or
+        None when the release renders no such document
+        '''
+        LOG.info("Template( %s ) : %s ", template_name, name)
 
-        for template in yaml.load_all(
-                getattr(templates.release, 'manifest', [])):
-            if template_name == template.get('metadata', None).get(
-                    'name', None):
-                LOG.info(template_name)
-                return template
+        if manifest is None:
+            manifest = self.get_rendered_manifest(release_name, namespace,
+                                                  chart, values)
+
+        if kind is not None:
+            template = manifest.get(kind, template_name)
+        else:
+            template = manifest.find(template_name)
+
+        # callers modify the template, keep the rendered one intact
+        return copy.deepcopy(template)
 
     def _pre_update_actions(self, actions, release_name, namespace, chart,
                             disable_hooks, values):
@@ -174,6 +327,14 @@ class Tiller(object):
         '''
 
         try:
+            # one render serves every daemonset, and a failed render
+            # leaves the deployed daemonsets in place
+            manifest = None
+            if any(action.get('type') == 'daemonset'
+                   for action in actions.get('update', [])):
+                manifest = self.get_rendered_manifest(release_name, namespace,
+                                                      chart, values)
+
             for action in actions.get('update', []):
                 name = action.get('name')
                 LOG.info('Updating %s ', name)
@@ -182,7 +343,8 @@ class Tiller(object):
 
                 self.rolling_upgrade_pod_deployment(
                     name, release_name, namespace, labels,
-                    action_type, chart, disable_hooks, values)
+                    action_type, chart, disable_hooks, values,
+                    manifest=manifest)
         except Exception:
             LOG.debug("Pre: Could not update anything, please check yaml")
 
@@ -245,7 +407,9 @@ class Tiller(object):
                 LOG.info("Deleting %s in namespace: %s",
                          pod_name, namespace)
                 self.k8s.delete_namespace_pod(pod_name, namespace)
-                self.k8s.wait_for_pod_redeployment(pod_name, namespace)
+                with self.timeline.span(pod_name, 'wait',
+                                        namespace=namespace):
+                    self.k8s.wait_for_pod_redeployment(pod_name, namespace)
         else:
             LOG.error("Unable to execute name: %s type: %s ",
                       resource_name, resource_type)
@@ -316,8 +480,8 @@ class Tiller(object):
                 wait=wait,
                 timeout=timeout)
 
-            stub.UpdateRelease(
-                release_request, self.timeout, metadata=self.metadata)
+            with observe_rpc('UpdateRelease', release_request, self.timeline):
+                self._send_chart(stub.UpdateRelease, release_request)
         except Exception:
             raise tiller_exceptions.ReleaseInstallException(release, namespace)
 
@@ -351,8 +515,8 @@ class Tiller(object):
                 wait=wait,
                 timeout=timeout)
 
-            return stub.InstallRelease(
-                release_request, self.timeout, metadata=self.metadata)
+            with observe_rpc('InstallRelease', release_request, self.timeline):
+                return self._send_chart(stub.InstallRelease, release_request)
 
         except Exception:
             raise tiller_exceptions.ReleaseInstallException(release, namespace)
@@ -371,12 +535,53 @@ class Tiller(object):
             release_request = UninstallReleaseRequest(
                 name=release, disable_hooks=disable_hooks, purge=purge)
 
-            return stub.UninstallRelease(
-                release_request, self.timeout, metadata=self.metadata)
+            with observe_rpc('UninstallRelease', release_request,
+                             self.timeline):
+                return stub.UninstallRelease(
+                    release_request, self.timeout, metadata=self.metadata)
 
         except Exception:
             raise tiller_exceptions.ReleaseUninstallException(release)
 
+    def uninstall_releases(self, releases, disable_hooks=False, purge=True,
+                           max_workers=None):
+        '''
+        :params releases - names of the releases to delete
+        :params disable_hooks - skip the hooks of the releases
+        :params purge - deep delete of the releases
+        :params max_workers - maximum number of releases deleted at the
+                              same time, defaults to UNINSTALL_WORKERS
+
+        Deletes the releases concurrently and returns an OrderedDict
+        mapping every release to None when it was deleted, or to the
+        exception raised while deleting it
+        '''
+        releases = list(releases)
+        results = collections.OrderedDict()
+        if not releases:
+            return results
+
+        # uninstalls belong to the trace of the caller
+        context = tracing.current_context()
+
+        def uninstall(release):
+            try:
+                with tracing.attach(context):
+                    self.uninstall_release(release,
+                                           disable_hooks=disable_hooks,
+                                           purge=purge)
+            except Exception as e:
+                LOG.error("Failed to uninstall release %s: %s", release, e)
+                return e
+
+        max_workers = min(max_workers or UNINSTALL_WORKERS, len(releases))
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for release, error in zip(releases,
+                                      executor.map(uninstall, releases)):
+                results[release] = error
+
+        return results
+
     def chart_cleanup(self, prefix, charts):
         '''
         :params charts - list of yaml charts
@@ -385,19 +590,24 @@ class Tiller(object):
         :result - will remove any chart that is not present in yaml
         '''
 
-        valid_charts = []
+        valid_charts = set()
         for gchart in charts:
             for chart in gchart.get('chart_group'):
-                valid_charts.append(release_prefix(
-                    prefix, chart.get('chart').get('name')))
+                valid_charts.add(release_prefix(
+                    prefix, chart.get('chart').get('release')))
+
+        stale_charts = sorted(
+            set(x.name for x in self.list_releases()
+                if x.name.startswith(prefix)) - valid_charts)
 
-        actual_charts = [x.name for x in self.list_releases()]
-        chart_diff = list(set(actual_charts) - set(valid_charts))
+        for chart in stale_charts:
+            LOG.debug("Release: %s will be removed", chart)
 
-        for chart in chart_diff:
-            if chart.startswith(prefix):
-                LOG.debug("Release: %s will be removed", chart)
-                self.uninstall_release(chart)
+        results = self.uninstall_releases(stale_charts)
+        failed = [chart for chart, error in results.items() if error]
+        if failed:
+            raise tiller_exceptions.ReleaseUninstallException(
+                ', '.join(failed))
 
     def delete_resources(self, release_name, resource_name, resource_type,
                          resource_labels, namespace):
@@ -442,16 +652,22 @@ class Tiller(object):
                 pod_name = pod.metadata.name
                 LOG.info("Deleting %s in namespace: %s", pod_name, namespace)
                 self.k8s.delete_namespace_pod(pod_name, namespace)
-                self.k8s.wait_for_pod_redeployment(pod_name, namespace)
+                with self.timeline.span(pod_name, 'wait',
+                                        namespace=namespace):
+                    self.k8s.wait_for_pod_redeployment(pod_name, namespace)
         else:
             LOG.error("Unable to execute name: %s type: %s ",
                       resource_name, resource_type)
 
     def rolling_upgrade_pod_deployment(self, name, release_name, namespace,
                                        labels, action_type, chart,
-                                       disable_hooks, values):
+                                       disable_hooks, values,
+                                       manifest=None):
         '''
         update statefullsets (daemon, stateful)
+
+        :params manifest - ManifestIndex of the release, see
+                           get_chart_templates
         '''
 
         if action_type == 'daemonset':
@@ -478,7 +694,8 @@ class Tiller(object):
                     # update the daemonset yaml
                     template = self.get_chart_templates(
                         ds_name, name, release_name, namespace, chart,
-                        disable_hooks, values)
+                        disable_hooks, values, kind='DaemonSet',
+                        manifest=manifest)
                     template['metadata']['labels'] = ds_labels
                     template['spec']['template']['metadata'][
                         'labels'] = ds_labels
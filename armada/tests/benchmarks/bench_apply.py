@@ -0,0 +1,159 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Apply path benchmarks against an in-process fake Tiller
+
+Runs ``Armada.sync`` on synthetic manifests and reports wall time, RPC
+counts, bytes sent to Tiller and memory for each scenario::
+
+    python -m armada.tests.benchmarks.bench_apply --output apply.json
+
+Scenarios per manifest size: ``install`` into an empty Tiller,
+``noop`` re-applying the same manifest and ``upgrade`` with new values.
+
+Every size runs in its own Python process. ``peak_rss`` of a size is the
+peak RSS of that process. ``peak_rss_growth`` of a scenario is how far the
+scenario raised that peak: all the memory ``install`` took, and for
+``noop`` and ``upgrade`` only what they took beyond the earlier scenarios,
+0 when they stayed below their peak.
+'''
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from armada.handlers.armada import Armada
+from armada.tests.benchmarks import utils
+from armada.tests.benchmarks.fake_tiller import FakeTiller
+
+SIZES = [10, 100, 1000]
+
+MODULE = 'armada.tests.benchmarks.bench_apply'
+
+
+def make_charts(root, count, pool, templates):
+    '''
+    Create pool chart directories shared round robin by count charts
+    '''
+    chart_dirs = [utils.make_chart(root, 'chart-%03d' % i,
+                                   templates=templates)
+                  for i in range(min(pool, count))]
+    return [('bench-%04d' % i, chart_dirs[i % len(chart_dirs)])
+            for i in range(count)]
+
+
+def expected_calls(scenario, count):
+    '''
+    Return the InstallRelease and UpdateRelease calls a scenario makes
+    '''
+    return {
+        'InstallRelease': count if scenario == 'install' else 0,
+        'UpdateRelease': count if scenario == 'upgrade' else 0,
+    }
+
+
+def run_scenario(tiller, manifest, scenario, count):
+    tiller.service.reset_stats()
+    peak = utils.peak_rss()
+
+    start = time.time()
+    Armada(manifest, tiller_host=tiller.host, tiller_port=tiller.port).sync()
+    elapsed = time.time() - start
+
+    result = tiller.service.stats()
+
+    # a run that installs or upgrades other releases than the scenario
+    # intends measures something else, fail instead of reporting it
+    calls = dict((method, result['rpc_calls'].get(method, 0))
+                 for method in ('InstallRelease', 'UpdateRelease'))
+    if calls != expected_calls(scenario, count):
+        raise RuntimeError('%s of %d charts made %s, expected %s' % (
+            scenario, count, calls, expected_calls(scenario, count)))
+
+    result['wall'] = elapsed
+    result['peak_rss_growth'] = utils.peak_rss() - peak
+    return result
+
+
+def bench_size(count, pool, templates, latency):
+    root = tempfile.mkdtemp(prefix='armada-bench')
+    try:
+        charts = make_charts(root, count, pool, templates)
+        with FakeTiller(latency=latency) as tiller:
+            install = run_scenario(tiller, utils.make_manifest(charts),
+                                   'install', count)
+            noop = run_scenario(tiller, utils.make_manifest(charts),
+                                'noop', count)
+            upgrade = run_scenario(
+                tiller, utils.make_manifest(charts, values={'replicas': 2}),
+                'upgrade', count)
+    finally:
+        shutil.rmtree(root)
+
+    return {
+        'charts': count,
+        'chart_sources': min(pool, count),
+        'templates_per_chart': templates,
+        'rpc_latency': latency,
+        'peak_rss': utils.peak_rss(),
+        'scenarios': {'install': install, 'noop': noop, 'upgrade': upgrade},
+    }
+
+
+def bench_size_process(count, pool, templates, latency):
+    '''
+    Run bench_size in a fresh process, so the peak RSS of one size is not
+    raised by another
+    '''
+    output = subprocess.check_output([
+        sys.executable, '-m', MODULE, '--run-size', str(count),
+        '--pool', str(pool), '--templates', str(templates),
+        '--latency', str(latency)])
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', help='JSON results file, default stdout')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='number of charts per manifest')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds each fake Tiller RPC sleeps')
+    parser.add_argument('--templates', type=int, default=10,
+                        help='templates per chart')
+    parser.add_argument('--pool', type=int, default=10,
+                        help='distinct chart directories shared by charts')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_size:
+        result = bench_size(args.run_size, args.pool, args.templates,
+                            args.latency)
+        sys.stdout.write(json.dumps(result) + '\n')
+        return
+
+    results = [bench_size_process(count, args.pool, args.templates,
+                                  args.latency)
+               for count in args.sizes]
+
+    utils.write_results('apply', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
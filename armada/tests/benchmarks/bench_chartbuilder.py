@@ -0,0 +1,217 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+ChartBuilder micro benchmarks
+
+Times every ChartBuilder stage on synthetic charts and records the memory
+taken by each stage::
+
+    python -m armada.tests.benchmarks.bench_chartbuilder --output cb.json
+
+get_helm_chart builds the whole chart, dump is timed on a chart that is
+already built and only measures the serialization.
+
+Every stage is also run once in a fresh Python process, which reports the
+growth of its peak RSS during the stage as allocated_bytes. Memory freed
+within the stage and reused is not counted, and the growth is rounded to
+pages.
+'''
+
+import argparse
+import collections
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from supermutes.dot import dotify
+
+from armada.handlers.chartbuilder import ChartBuilder
+from armada.tests.benchmarks import utils
+
+STAGES = ['get_metadata', 'get_values', 'get_templates', 'get_helm_chart',
+          'dump']
+
+MODULE = 'armada.tests.benchmarks.bench_chartbuilder'
+
+# stages run untimed before a stage, so its time is its own
+STAGE_SETUP = {
+    'dump': 'get_helm_chart',
+}
+
+# name -> chart parameters, dependencies share the parameters of the
+# parent chart minus the fan-out
+Scenario = collections.namedtuple(
+    'Scenario', 'templates depth values_size helmignore dependencies')
+
+SCENARIOS = collections.OrderedDict([
+    ('templates-10', Scenario(10, 0, 0, 0, 0)),
+    ('templates-100', Scenario(100, 0, 0, 0, 0)),
+    ('templates-1000', Scenario(1000, 0, 0, 0, 0)),
+    ('templates-5000', Scenario(5000, 0, 0, 0, 0)),
+    ('deep-tree-1000', Scenario(1000, 8, 0, 0, 0)),
+    ('values-1m', Scenario(10, 0, 2 ** 20, 0, 0)),
+    ('values-16m', Scenario(10, 0, 2 ** 24, 0, 0)),
+    ('helmignore-10', Scenario(1000, 2, 0, 10, 0)),
+    ('helmignore-100', Scenario(1000, 2, 0, 100, 0)),
+    ('helmignore-1000', Scenario(1000, 2, 0, 1000, 0)),
+    ('dependencies-1', Scenario(100, 0, 0, 0, 1)),
+    ('dependencies-10', Scenario(100, 0, 0, 0, 10)),
+    ('dependencies-50', Scenario(100, 0, 0, 0, 50)),
+])
+
+
+def helmignore_patterns(count):
+    '''
+    Patterns that never match the generated templates, so every file is
+    checked against every pattern
+    '''
+    patterns = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            patterns.append('*.bak%d' % i)
+        elif kind == 1:
+            patterns.append('ignored-%05d.yaml' % i)
+        elif kind == 2:
+            patterns.append('tests-%d/*' % i)
+        else:
+            patterns.append('**/*.tmp%d' % i)
+    return patterns
+
+
+def make_chart_spec(root, name, scenario):
+    '''
+    Write the charts of a scenario and return the chart definition the
+    apply engine would hand to ChartBuilder
+    '''
+    helmignore = None
+    if scenario.helmignore:
+        helmignore = helmignore_patterns(scenario.helmignore)
+
+    utils.make_chart(root, name, templates=scenario.templates,
+                     depth=scenario.depth, values_size=scenario.values_size,
+                     helmignore=helmignore)
+
+    dependencies = []
+    for i in range(scenario.dependencies):
+        dep = make_chart_spec(root, '%s-dep-%02d' % (name, i),
+                              scenario._replace(dependencies=0))
+        dependencies.append({'chart': dep})
+
+    return {
+        'chart_name': name,
+        'release': name,
+        'namespace': 'default',
+        'source_dir': (root, name),
+        'dependencies': dependencies,
+    }
+
+
+def prepare(chart, stage):
+    '''
+    Return a fresh ChartBuilder with the setup of the stage done, so no
+    stage is served from the cached protobuf of a previous sample
+    '''
+    chartbuilder = ChartBuilder(chart)
+    if stage in STAGE_SETUP:
+        getattr(chartbuilder, STAGE_SETUP[stage])()
+    return chartbuilder
+
+
+def run_stage(chartbuilder, stage):
+    getattr(chartbuilder, stage)()
+
+
+def measure_allocations(chart, stage):
+    '''
+    Return the peak RSS growth in bytes of running the stage in a fresh
+    process, where memory held by earlier stages cannot hide it
+    '''
+    process = subprocess.Popen(
+        [sys.executable, '-m', MODULE, '--measure', stage],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output, _ = process.communicate(json.dumps(chart).encode('utf-8'))
+    if process.returncode != 0:
+        raise RuntimeError('Measuring %s failed with exit code %d' % (
+            stage, process.returncode))
+    return int(output.decode('utf-8').split()[-1])
+
+
+def measure_stage(stage):
+    '''
+    Run the stage on the chart definition read from stdin and print the
+    growth of the peak RSS of this process
+    '''
+    chartbuilder = prepare(dotify(json.load(sys.stdin)), stage)
+    before = utils.peak_rss()
+    run_stage(chartbuilder, stage)
+    sys.stdout.write('%d\n' % (utils.peak_rss() - before))
+
+
+def bench_stage(chart, stage, repeat):
+    result = utils.timed(lambda chartbuilder: run_stage(chartbuilder, stage),
+                         repeat, setup=lambda: prepare(chart, stage))
+    result['allocated_bytes'] = measure_allocations(chart, stage)
+    return result
+
+
+def bench_scenario(scenario, repeat):
+    root = tempfile.mkdtemp(prefix='armada-bench')
+    try:
+        chart = dotify(make_chart_spec(root, 'bench', scenario))
+        stages = collections.OrderedDict(
+            (stage, bench_stage(chart, stage, repeat)) for stage in STAGES)
+        payload_bytes = len(ChartBuilder(chart).dump())
+    finally:
+        shutil.rmtree(root)
+
+    result = dict(scenario._asdict())
+    result['payload_bytes'] = payload_bytes
+    result['stages'] = stages
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', help='JSON results file, default stdout')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='samples per stage')
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        choices=list(SCENARIOS),
+                        help='scenario to run, may be repeated, default all')
+    parser.add_argument('--measure', choices=STAGES,
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        measure_stage(args.measure)
+        return
+
+    scenarios = collections.OrderedDict()
+    for name in args.scenarios or SCENARIOS:
+        scenarios[name] = bench_scenario(SCENARIOS[name], args.repeat)
+
+    results = {
+        'allocation_method': 'subprocess-peak-rss',
+        'scenarios': scenarios,
+    }
+
+    utils.write_results('chartbuilder', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
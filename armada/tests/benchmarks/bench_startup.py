@@ -0,0 +1,205 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Startup and import time benchmarks
+
+Records a per module import time breakdown of the Armada entry points and
+the wall time of ``armada validate`` on the bundled examples::
+
+    python -m armada.tests.benchmarks.bench_startup --output startup.json
+
+The breakdown comes from ``python -X importtime`` where the interpreter
+supports it (3.7+) and from an ``__import__`` hook otherwise.
+'''
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+from armada.tests.benchmarks import utils
+
+MODULES = ['armada.shell', 'armada.api.server', 'armada.handlers.armada']
+
+# runs a cli command the same way the armada console script does
+CLI_SCRIPT = ('import sys\n'
+              'from armada.shell import main\n'
+              'sys.exit(main(sys.argv[1:]))')
+
+# times every import that loads new modules, mirroring the records
+# of -X importtime on interpreters that do not support it
+IMPORT_HOOK_SCRIPT = '''
+import json, sys, time
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+_import = builtins.__import__
+_stack = []
+_records = []
+
+def _timed_import(name, *args, **kwargs):
+    loaded = len(sys.modules)
+    _stack.append(0.0)
+    start = time.time()
+    try:
+        return _import(name, *args, **kwargs)
+    finally:
+        elapsed = time.time() - start
+        children = _stack.pop()
+        if _stack:
+            _stack[-1] += elapsed
+        if len(sys.modules) > loaded:
+            _records.append((len(_stack), name, elapsed - children, elapsed))
+
+builtins.__import__ = _timed_import
+import {module}
+builtins.__import__ = _import
+sys.stderr.write(json.dumps(_records))
+'''
+
+
+def supports_importtime():
+    return sys.version_info >= (3, 7)
+
+
+def run(args, env=None):
+    '''
+    Run a python subprocess from the repository root, returning its wall
+    time, exit code and stderr
+    '''
+    start = time.time()
+    proc = subprocess.Popen([sys.executable] + args, cwd=utils.ROOT_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=env)
+    _, err = proc.communicate()
+    return time.time() - start, proc.returncode, err.decode('utf-8')
+
+
+def parse_importtime(output):
+    '''
+    :params output - stderr of python -X importtime
+
+    Returns a list of (level, module, self_us, cumulative_us) records
+    '''
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2][1:].rstrip()
+        level = (len(name) - len(name.lstrip())) // 2
+        records.append((level, name.strip(),
+                        int(fields[0]), int(fields[1])))
+    return records
+
+
+def import_records(module):
+    '''
+    Return the import time records for importing module in a fresh
+    interpreter, in microseconds
+    '''
+    if supports_importtime():
+        _, code, err = run(['-X', 'importtime', '-c', 'import ' + module])
+        records = parse_importtime(err)
+    else:
+        _, code, err = run(['-c', IMPORT_HOOK_SCRIPT.format(module=module)])
+        records = [(level, name, int(own * 1e6), int(total * 1e6))
+                   for level, name, own, total in json.loads(
+                       err.strip().splitlines()[-1])]
+
+    if code != 0:
+        raise RuntimeError('Failed to import %s: %s' % (module, err))
+
+    return records
+
+
+def bench_import(module, baseline, repeat, top):
+    '''
+    :params module - module to import
+    :params baseline - modules already loaded by a bare interpreter
+    :params repeat - number of wall time samples
+    :params top - number of slowest modules to keep in the breakdown
+    '''
+    records = [r for r in import_records(module) if r[1] not in baseline]
+    breakdown = sorted(
+        [{'module': name, 'level': level, 'self_us': own,
+          'cumulative_us': total} for level, name, own, total in records],
+        key=lambda x: x['cumulative_us'], reverse=True)
+
+    samples = [run(['-c', 'import ' + module])[0] for _ in range(repeat)]
+
+    return {
+        'method': 'importtime' if supports_importtime() else 'import-hook',
+        'total_us': sum(r[3] for r in records if r[0] == 0),
+        'modules_loaded': len(records),
+        'wall': utils.summarize(samples),
+        'breakdown': breakdown[:top] if top else breakdown,
+    }
+
+
+def bench_validate(path, repeat):
+    '''
+    Time ``armada validate`` on an example manifest
+    '''
+    samples = []
+    code = None
+    for _ in range(repeat):
+        elapsed, code, _ = run(['-c', CLI_SCRIPT, 'validate', path])
+        samples.append(elapsed)
+
+    return {'returncode': code, 'wall': utils.summarize(samples)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--output', help='JSON results file, default stdout')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='wall time samples per measurement')
+    parser.add_argument('--top', type=int, default=50,
+                        help='slowest modules kept per breakdown, 0 for all')
+    parser.add_argument('--module', action='append', dest='modules',
+                        help='module to measure, may be repeated')
+    parser.add_argument('--manifest', action='append', dest='manifests',
+                        help='manifest to validate, default examples/*.yaml')
+    args = parser.parse_args(argv)
+
+    baseline = set(r[1] for r in import_records('sys'))
+    interpreter = utils.summarize(
+        [run(['-c', 'pass'])[0] for _ in range(args.repeat)])
+
+    results = {'interpreter': interpreter, 'imports': {}, 'validate': {}}
+
+    for module in args.modules or MODULES:
+        results['imports'][module] = bench_import(
+            module, baseline, args.repeat, args.top)
+
+    manifests = args.manifests or sorted(
+        os.path.relpath(x, utils.ROOT_DIR) for x in glob.glob(
+            os.path.join(utils.ROOT_DIR, 'examples', '*.yaml')))
+    for manifest in manifests:
+        results['validate'][manifest] = bench_validate(manifest, args.repeat)
+
+    utils.write_results('startup', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
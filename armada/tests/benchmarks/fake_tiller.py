@@ -0,0 +1,199 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+In-process fake of the Tiller ReleaseService
+
+Keeps releases in memory, renders manifests by concatenating the chart
+templates and counts every RPC and the bytes received per method, so the
+apply engine can be measured without a cluster.
+'''
+
+import collections
+import threading
+import time
+
+from concurrent import futures
+import grpc
+
+from hapi.release.info_pb2 import Info
+from hapi.release.release_pb2 import Release
+from hapi.release.status_pb2 import Status
+from hapi.services import tiller_pb2
+from hapi.services import tiller_pb2_grpc
+from hapi.version.version_pb2 import Version
+
+from armada.handlers.tiller import MAX_MESSAGE_LENGTH, TILLER_VERSION
+
+
+def render_manifest(chart):
+    '''
+    Stand-in for template rendering, concatenates the chart templates
+    '''
+    documents = []
+    for template in chart.templates:
+        documents.append('---\n# Source: %s/templates/%s\n%s' % (
+            chart.metadata.name, template.name, template.data))
+    for dependency in chart.dependencies:
+        documents.append(render_manifest(dependency))
+    return '\n'.join(documents)
+
+
+class FakeReleaseService(tiller_pb2_grpc.ReleaseServiceServicer):
+    '''
+    ReleaseService implementation backed by a dict of releases
+    '''
+
+    def __init__(self, latency=0.0):
+        '''
+        :params latency - seconds every RPC sleeps before answering, or a
+                          dict of per method latencies
+        '''
+        self.latency = latency
+        self.releases = collections.OrderedDict()
+        self.calls = collections.Counter()
+        self.bytes_received = collections.Counter()
+        self._lock = threading.Lock()
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes_received.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rpc_calls': dict(self.calls),
+                'rpc_bytes': dict(self.bytes_received),
+                'total_calls': sum(self.calls.values()),
+                'total_bytes': sum(self.bytes_received.values()),
+            }
+
+    def _record(self, method, request):
+        with self._lock:
+            self.calls[method] += 1
+            self.bytes_received[method] += request.ByteSize()
+
+        if isinstance(self.latency, dict):
+            delay = self.latency.get(method, 0.0)
+        else:
+            delay = self.latency
+        if delay:
+            time.sleep(delay)
+
+    def _release(self, name, namespace, chart, values, version, dry_run):
+        release = Release(
+            name=name,
+            namespace=namespace,
+            chart=chart,
+            config=values,
+            version=version,
+            manifest=render_manifest(chart),
+            info=Info(status=Status(code=Status.DEPLOYED)))
+        if not dry_run:
+            with self._lock:
+                self.releases[name] = release
+        return release
+
+    def ListReleases(self, request, context):
+        self._record('ListReleases', request)
+        with self._lock:
+            releases = [
+                r for r in reversed(self.releases.values())
+                if not request.status_codes
+                or r.info.status.code in request.status_codes]
+        total = len(releases)
+
+        # pages continue from the release named by offset, as in Tiller
+        if request.offset:
+            names = [r.name for r in releases]
+            if request.offset not in names:
+                context.set_code(grpc.StatusCode.NOT_FOUND)
+                context.set_details('offset %s not found' % request.offset)
+                return
+            releases = releases[names.index(request.offset):]
+        next_name = ''
+        if request.limit and len(releases) > request.limit:
+            next_name = releases[request.limit].name
+            releases = releases[:request.limit]
+        yield tiller_pb2.ListReleasesResponse(
+            count=len(releases), next=next_name, total=total,
+            releases=releases)
+
+    def InstallRelease(self, request, context):
+        self._record('InstallRelease', request)
+        release = self._release(request.name, request.namespace,
+                                request.chart, request.values, 1,
+                                request.dry_run)
+        return tiller_pb2.InstallReleaseResponse(release=release)
+
+    def UpdateRelease(self, request, context):
+        self._record('UpdateRelease', request)
+        with self._lock:
+            current = self.releases.get(request.name)
+        if current is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details('release %s not found' % request.name)
+            return tiller_pb2.UpdateReleaseResponse()
+        release = self._release(request.name, current.namespace,
+                                request.chart, request.values,
+                                current.version + 1, request.dry_run)
+        return tiller_pb2.UpdateReleaseResponse(release=release)
+
+    def UninstallRelease(self, request, context):
+        self._record('UninstallRelease', request)
+        with self._lock:
+            release = self.releases.pop(request.name, None)
+        if release is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details('release %s not found' % request.name)
+            return tiller_pb2.UninstallReleaseResponse()
+        return tiller_pb2.UninstallReleaseResponse(release=release)
+
+    def GetVersion(self, request, context):
+        self._record('GetVersion', request)
+        return tiller_pb2.GetVersionResponse(
+            Version=Version(sem_ver='v' + TILLER_VERSION.decode('utf-8')))
+
+
+class FakeTiller(object):
+    '''
+    gRPC server hosting a FakeReleaseService on a local port
+    '''
+
+    def __init__(self, latency=0.0, max_workers=16):
+        self.service = FakeReleaseService(latency=latency)
+        self.server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=max_workers),
+            options=[
+                ('grpc.max_send_message_length', MAX_MESSAGE_LENGTH),
+                ('grpc.max_receive_message_length', MAX_MESSAGE_LENGTH)
+            ])
+        tiller_pb2_grpc.add_ReleaseServiceServicer_to_server(
+            self.service, self.server)
+        self.host = '127.0.0.1'
+        self.port = self.server.add_insecure_port('%s:0' % self.host)
+
+    def start(self):
+        self.server.start()
+        return self
+
+    def stop(self):
+        self.server.stop(0)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
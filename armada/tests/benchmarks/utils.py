@@ -0,0 +1,219 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import yaml
+
+ROOT_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def git_revision():
+    '''
+    Return the commit the benchmark runs against, if known
+    '''
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR,
+                stderr=devnull).decode('utf-8').strip()
+    except Exception:
+        return None
+
+
+def summarize(samples):
+    '''
+    :params samples - list of measured durations in seconds
+
+    Return min, median, mean and max of the samples
+    '''
+    ordered = sorted(samples)
+    count = len(ordered)
+    if count % 2:
+        median = ordered[count // 2]
+    else:
+        median = (ordered[count // 2 - 1] + ordered[count // 2]) / 2.0
+
+    return {
+        'samples': count,
+        'min': ordered[0],
+        'median': median,
+        'mean': sum(ordered) / float(count),
+        'max': ordered[-1],
+    }
+
+
+def timed(func, repeat=1, setup=None):
+    '''
+    :params setup - called before every sample and left out of its time,
+                    func is called with its result
+
+    Call func repeat times and return the summary of the wall times
+    '''
+    samples = []
+    for _ in range(repeat):
+        args = (setup(),) if setup is not None else ()
+        start = time.time()
+        func(*args)
+        samples.append(time.time() - start)
+    return summarize(samples)
+
+
+def peak_rss():
+    '''
+    Return the peak resident set size of this process in bytes
+    '''
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on darwin and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return usage
+    return usage * 1024
+
+
+TEMPLATE = '''apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: {{ .Release.Name }}-%(name)s
+  labels:
+    release_name: {{ .Release.Name }}
+data:
+  index: "%(index)s"
+  payload: |
+%(payload)s
+'''
+
+
+def make_chart(root, name, templates=10, template_size=512, values_size=0,
+               depth=0, helmignore=None):
+    '''
+    :params root - directory to create the chart in
+    :params name - chart name, also the chart directory name
+    :params templates - number of templates to generate
+    :params template_size - approximate size of each template in bytes
+    :params values_size - approximate size of values.yaml in bytes
+    :params depth - nest templates this many directories deep
+    :params helmignore - list of .helmignore patterns
+
+    Writes a synthetic helm chart and returns its directory
+    '''
+    chart_dir = os.path.join(root, name)
+    os.makedirs(os.path.join(chart_dir, 'templates'))
+
+    if helmignore is not None:
+        with open(os.path.join(chart_dir, '.helmignore'), 'w') as f:
+            f.write('\n'.join(helmignore) + '\n')
+
+    with open(os.path.join(chart_dir, 'Chart.yaml'), 'w') as f:
+        yaml.safe_dump({'apiVersion': 'v1', 'name': name,
+                        'description': 'Synthetic benchmark chart',
+                        'version': '0.1.0'}, f, default_flow_style=False)
+
+    with open(os.path.join(chart_dir, 'values.yaml'), 'w') as f:
+        f.write('replicas: 1\n')
+        for i in range(values_size // 32):
+            f.write('key_%06d: value-%015d\n' % (i, i))
+
+    line = '    ' + 'x' * 75 + '\n'
+    payload = line * max(1, template_size // len(line))
+    for i in range(templates):
+        tpl_name = 'configmap-%05d' % i
+        # spread templates over branches of nested directories
+        tpl_dir = os.path.join(chart_dir, 'templates', *[
+            'dir-%d-%d' % (level, i % (level + 2)) for level in range(depth)])
+        if not os.path.isdir(tpl_dir):
+            os.makedirs(tpl_dir)
+        with open(os.path.join(tpl_dir, tpl_name + '.yaml'), 'w') as f:
+            f.write(TEMPLATE % {'name': tpl_name, 'index': i,
+                                'payload': payload.rstrip('\n')})
+
+    return chart_dir
+
+
+def make_manifest(charts, prefix='bench', values=None):
+    '''
+    :params charts - list of (chart_name, chart_dir) tuples
+    :params prefix - release prefix of the manifest
+    :params values - values set on every chart
+
+    Returns an armada manifest deploying every chart from a local source
+    '''
+    documents = []
+    for chart_name, chart_dir in charts:
+        documents.append({
+            'schema': 'armada/Chart/v1',
+            'metadata': {'schema': 'metadata/Document/v1',
+                         'name': chart_name},
+            'data': {
+                'chart_name': chart_name,
+                'release': chart_name,
+                'namespace': 'default',
+                'values': values or {},
+                'upgrade': {'no_hooks': False},
+                'source': {'type': 'local',
+                           'location': os.path.dirname(chart_dir),
+                           'subpath': os.path.basename(chart_dir),
+                           'reference': None},
+                'dependencies': [],
+            }
+        })
+
+    documents.append({
+        'schema': 'armada/ChartGroup/v1',
+        'metadata': {'schema': 'metadata/Document/v1', 'name': 'bench'},
+        'data': {'description': 'Benchmark charts', 'sequenced': False,
+                 'chart_group': [name for name, _ in charts]}
+    })
+    documents.append({
+        'schema': 'armada/Manifest/v1',
+        'metadata': {'schema': 'metadata/Document/v1',
+                     'name': 'bench-manifest'},
+        'data': {'release_prefix': prefix, 'chart_groups': ['bench']}
+    })
+
+    return yaml.safe_dump_all(documents, default_flow_style=False)
+
+
+def write_results(name, results, output=None):
+    '''
+    :params name - name of the benchmark suite
+    :params results - JSON serializable benchmark results
+    :params output - file to write to, stdout if not given
+
+    Results are wrapped with the commit and interpreter they were
+    measured on so runs can be compared between commits
+    '''
+    document = {
+        'benchmark': name,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'results': results,
+    }
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    else:
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+    return document
@@ -19,12 +19,14 @@ import unittest
 from falcon import testing
 
 from armada.api import server
+from armada.api import tiller_controller
 
 class APITestCase(testing.TestCase):
     def setUp(self):
         super(APITestCase, self).setUp()
 
         self.app = server.create(middleware=False)
+        tiller_controller.invalidate_releases()
 
 class TestAPI(APITestCase):
     @unittest.skip('this is incorrectly tested')
@@ -50,6 +52,128 @@ class TestAPI(APITestCase):
         result = self.simulate_post(path='/armada/apply', body=body)
         self.assertEqual(result.json, doc)
 
+    @mock.patch('armada.api.armada_controller.get_job_manager')
+    def test_armada_apply_queues_job(self, mock_manager):
+        '''
+        Test /armada/apply returns a job instead of waiting for the apply
+        '''
+        from armada.api.jobs import Job
+
+        job = Job()
+        mock_manager.return_value.submit.return_value = job
+        body = json.dumps({'file': 'examples/simple.yaml',
+                           'options': {}})
+
+        with mock.patch('armada.api.armada_controller.open',
+                        mock.mock_open(read_data='documents'), create=True):
+            result = self.simulate_post(path='/armada/apply', body=body)
+
+        self.assertEqual(202, result.status_code)
+        self.assertEqual(job.id, result.json['id'])
+        self.assertEqual('queued', result.json['status'])
+        self.assertTrue(result.headers['location'].endswith(
+            '/armada/jobs/' + job.id))
+        submit_args = mock_manager.return_value.submit.call_args[0]
+        self.assertEqual('documents', submit_args[1])
+
+    @mock.patch('armada.api.armada_controller.get_job_manager')
+    def test_armada_apply_queue_full(self, mock_manager):
+        '''
+        Test /armada/apply rejects jobs when the queue is full
+        '''
+        from armada.exceptions.api_exceptions import JobQueueFullException
+
+        mock_manager.return_value.submit.side_effect = \
+            JobQueueFullException(16)
+        body = json.dumps({'file': 'examples/simple.yaml',
+                           'options': {}})
+
+        with mock.patch('armada.api.armada_controller.open',
+                        mock.mock_open(read_data='documents'), create=True):
+            result = self.simulate_post(path='/armada/apply', body=body)
+
+        self.assertEqual(503, result.status_code)
+
+    @mock.patch('armada.api.armada_controller.get_job_manager')
+    def test_armada_job_status(self, mock_manager):
+        '''
+        Test /armada/jobs/{job_id} endpoint
+        '''
+        from armada.api.jobs import Job
+
+        job = Job()
+        job.on_event({'event': 'upgraded', 'release': 'mariadb',
+                      'duration': 2.0})
+        mock_manager.return_value.get.side_effect = \
+            lambda job_id: job if job_id == job.id else None
+
+        job.set_timeline({'duration': 2.5, 'spans': []})
+
+        result = self.simulate_get('/armada/jobs/' + job.id)
+        self.assertEqual(200, result.status_code)
+        self.assertEqual({'status': 'upgraded', 'duration': 2.0},
+                         result.json['charts']['mariadb'])
+        self.assertEqual(2.5, result.json['timeline']['duration'])
+
+        result = self.simulate_get('/armada/jobs/unknown')
+        self.assertEqual(404, result.status_code)
+
+    @mock.patch('armada.api.armada_controller.invalidate_releases')
+    @mock.patch('armada.api.armada_controller.Handler')
+    def test_apply_job_records_timeline(self, mock_handler, mock_invalidate):
+        '''
+        Test apply jobs keep the timeline of failed applies too
+        '''
+        from armada.api.armada_controller import apply_job
+        from armada.api.jobs import Job
+
+        job = Job()
+        armada = mock_handler.return_value
+        armada.sync.side_effect = Exception('failed')
+        armada.timeline.to_dict.return_value = {'spans': []}
+        opts = dict.fromkeys(['disable_update_pre', 'disable_update_post',
+                              'enable_chart_cleanup', 'dry_run', 'wait',
+                              'timeout'])
+
+        self.assertRaises(Exception, apply_job, job, '', opts)
+
+        self.assertEqual({'spans': []}, job.timeline)
+        mock_invalidate.assert_called_once_with()
+
+    @mock.patch('armada.api.armada_controller.get_job_manager')
+    def test_armada_job_events(self, mock_manager):
+        '''
+        Test /armada/jobs/{job_id}/events endpoint
+        '''
+        from armada.api.jobs import Job, STATUS_RUNNING, STATUS_SUCCEEDED
+
+        job = Job()
+        job.set_status(STATUS_RUNNING)
+        job.on_event({'event': 'installed', 'release': 'mariadb',
+                      'duration': 2.0})
+        job.set_status(STATUS_SUCCEEDED)
+        mock_manager.return_value.get.side_effect = \
+            lambda job_id: job if job_id == job.id else None
+
+        result = self.simulate_get('/armada/jobs/{}/events'.format(job.id))
+        self.assertEqual(200, result.status_code)
+        self.assertEqual('application/x-ndjson',
+                         result.headers['content-type'])
+        events = [json.loads(line) for line in result.text.splitlines()]
+        self.assertEqual(['job', 'installed', 'job'],
+                         [event['event'] for event in events])
+
+        result = self.simulate_get(
+            '/armada/jobs/{}/events'.format(job.id),
+            headers={'Accept': 'text/event-stream'})
+        self.assertEqual('text/event-stream', result.headers['content-type'])
+        frames = result.text.split('\n\n')[:-1]
+        self.assertEqual(3, len(frames))
+        self.assertTrue(frames[1].startswith('event: installed\ndata: '))
+
+        result = self.simulate_get('/armada/jobs/unknown/events')
+        self.assertEqual(404, result.status_code)
+
     @mock.patch('armada.api.tiller_controller.tillerHandler')
     def test_tiller_status(self, mock_tiller):
         '''
@@ -77,3 +201,90 @@ class TestAPI(APITestCase):
 
         result = self.simulate_get('/tiller/releases')
         self.assertEqual(result.json, doc)
+
+    @mock.patch('armada.api.tiller_controller.tillerHandler')
+    def test_tiller_releases_cached(self, mock_tiller):
+        '''
+        Test /tiller/releases filters, pagination and conditional requests
+        '''
+        releases = []
+        for name, status in (('keystone', 1), ('etcd', 1),
+                             ('mariadb', 4)):
+            release = mock.Mock(namespace='openstack')
+            release.name = name
+            release.info.status.code = status
+            release.info.status.Code.Name.side_effect = \
+                lambda code: {1: 'DEPLOYED', 4: 'FAILED'}[code]
+            releases.append(release)
+        mock_tiller.return_value.list_releases.return_value = releases
+
+        result = self.simulate_get('/tiller/releases')
+        self.assertEqual(['etcd', 'keystone', 'mariadb'],
+                         sorted(result.json['releases']))
+        self.assertEqual('3', result.headers['x-total-count'])
+        etag = result.headers['etag']
+
+        # unchanged releases are served from the cache as not modified
+        result = self.simulate_get('/tiller/releases',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(304, result.status_code)
+        self.assertEqual('', result.text)
+        self.assertEqual(1, mock_tiller.return_value.list_releases.call_count)
+
+        result = self.simulate_get('/tiller/releases',
+                                   query_string='status=deployed&limit=1')
+        self.assertEqual({'etcd': 'openstack'}, result.json['releases'])
+        self.assertEqual('2', result.headers['x-total-count'])
+        self.assertNotEqual(etag, result.headers['etag'])
+
+        result = self.simulate_get('/tiller/releases',
+                                   query_string='offset=2')
+        self.assertEqual({'mariadb': 'openstack'}, result.json['releases'])
+
+    @mock.patch('armada.api.tiller_controller.tillerHandler')
+    def test_metrics(self, mock_tiller):
+        '''
+        Test /metrics endpoint
+        '''
+        self.simulate_get('/tiller/status')
+
+        result = self.simulate_get('/metrics')
+        self.assertEqual(200, result.status_code)
+        self.assertTrue(result.headers['content-type'].startswith(
+            'text/plain; version=0.0.4'))
+        self.assertIn('armada_api_request_duration_seconds_count{'
+                      'route="Status",method="GET",status="200"}',
+                      result.text)
+        self.assertIn('# TYPE armada_tiller_rpcs_total counter', result.text)
+
+    @mock.patch('armada.api.armada_controller.get_job_manager')
+    def test_trace_continued_into_job(self, mock_manager):
+        '''
+        Test apply jobs continue the trace of the request submitting them
+        '''
+        from armada.api.jobs import JobManager
+        from armada.utils import tracing
+
+        exporter = tracing.InMemoryExporter()
+        tracing.configure(exporter)
+        self.addCleanup(tracing.configure, None)
+        manager = JobManager(max_workers=1, max_queued=1)
+        self.addCleanup(manager.shutdown)
+        mock_manager.return_value = manager
+
+        trace_id = '0af7651916cd43dd8448eb211c80319c'
+        with mock.patch('armada.api.armada_controller.open',
+                        mock.mock_open(read_data=''), create=True), \
+                mock.patch('armada.api.armada_controller.apply_job'):
+            self.simulate_post('/armada/apply', body=json.dumps({
+                'file': 'armada.yaml', 'options': {}}), headers={
+                    'traceparent': '00-{}-b7ad6b7169203331-01'.format(
+                        trace_id)})
+        manager.shutdown()
+
+        names = [span.name for span in exporter.spans]
+        self.assertIn('job', names)
+        self.assertIn('POST /armada/apply', names)
+        self.assertEqual({trace_id},
+                         set(span.context.trace_id
+                             for span in exporter.spans))
@@ -0,0 +1,127 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from armada.api import jobs
+from armada.exceptions.api_exceptions import JobQueueFullException
+
+
+class JobManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = jobs.JobManager(max_workers=1, max_queued=1)
+        self.addCleanup(self.manager.shutdown)
+
+    def test_job_succeeds(self):
+        def work(job, release):
+            job.on_event({'event': 'installed', 'release': release,
+                          'duration': 1.5})
+
+        job = self.manager.submit(work, 'mariadb')
+        self.manager.shutdown()
+
+        result = job.to_dict()
+        self.assertEqual(jobs.STATUS_SUCCEEDED, result['status'])
+        self.assertEqual({'mariadb': {'status': 'installed',
+                                      'duration': 1.5}},
+                         dict(result['charts']))
+        self.assertIs(job, self.manager.get(job.id))
+
+    def test_job_fails(self):
+        def work(job):
+            raise Exception('boom')
+
+        job = self.manager.submit(work)
+        self.manager.shutdown()
+
+        self.assertEqual(jobs.STATUS_FAILED, job.status)
+        self.assertEqual('boom', job.error)
+        self.assertIsNotNone(job.finished)
+
+    def test_queue_depth_limit(self):
+        running = threading.Event()
+        release = threading.Event()
+
+        def work(job):
+            running.set()
+            release.wait(5)
+
+        first = self.manager.submit(work)
+        running.wait(5)
+        # one job runs and one waits, the next one is rejected
+        second = self.manager.submit(work)
+        self.assertRaises(JobQueueFullException, self.manager.submit, work)
+
+        self.assertEqual(jobs.STATUS_RUNNING, first.status)
+        self.assertEqual(jobs.STATUS_QUEUED, second.status)
+
+        release.set()
+        self.manager.shutdown()
+        self.assertEqual(jobs.STATUS_SUCCEEDED, second.status)
+
+    def test_finished_jobs_pruned(self):
+        manager = jobs.JobManager(max_workers=1, max_queued=5, history=2)
+        self.addCleanup(manager.shutdown)
+        submitted = []
+        for _ in range(4):
+            submitted.append(manager.submit(lambda job: None))
+            manager.shutdown()
+
+        manager.submit(lambda job: None)
+        manager.shutdown()
+
+        ids = [job.id for job in manager.list()]
+        self.assertEqual(3, len(ids))
+        self.assertNotIn(submitted[0].id, ids)
+        self.assertNotIn(submitted[1].id, ids)
+
+
+class JobEventsTestCase(unittest.TestCase):
+
+    def test_iter_events_until_finished(self):
+        job = jobs.Job()
+        job.set_status(jobs.STATUS_RUNNING)
+        job.on_event({'event': 'installed', 'release': 'mariadb',
+                      'duration': 1.0})
+        job.set_status(jobs.STATUS_SUCCEEDED)
+
+        events = list(job.iter_events())
+        self.assertEqual(['job', 'installed', 'job'],
+                         [event['event'] for event in events])
+        self.assertEqual(jobs.STATUS_SUCCEEDED, events[-1]['status'])
+
+    def test_iter_events_waits_for_events(self):
+        job = jobs.Job()
+        job.set_status(jobs.STATUS_RUNNING)
+        events = job.iter_events(heartbeat=0.01)
+
+        self.assertEqual(jobs.STATUS_RUNNING, next(events)['status'])
+        # nothing happened within the heartbeat
+        self.assertIsNone(next(events))
+
+        def finish():
+            job.on_event({'event': 'failed', 'release': 'mariadb',
+                          'duration': 1.0, 'error': 'boom'})
+            job.set_status(jobs.STATUS_FAILED, error='boom')
+
+        thread = threading.Thread(target=finish)
+        thread.start()
+        rest = [event for event in events if event is not None]
+        thread.join()
+
+        self.assertEqual(['failed', 'job'],
+                         [event['event'] for event in rest])
+        self.assertEqual('boom', rest[-1]['error'])
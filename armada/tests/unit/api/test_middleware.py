@@ -0,0 +1,131 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import falcon
+import mock
+import unittest
+
+from falcon import testing
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+import armada.conf as configs
+from armada.api.middleware import AuthMiddleware
+
+configs.set_app_default_configs()
+
+
+class FakeKeystone(object):
+    '''
+    Answers the keystone requests of AuthMiddleware and counts them
+    '''
+
+    ROLES = {u'1': u'admin', u'2': u'member', u'3': u'reader'}
+    ASSIGNMENTS = {u'alice': [u'1', u'2'], u'bob': [u'2', u'3', u'2']}
+
+    def __init__(self, include_names=True):
+        self.include_names = include_names
+        self.requests = []
+
+    def get(self, url, auth=None):
+        url = urlparse(url)
+        self.requests.append(url.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+
+        resp = mock.Mock()
+        if url.path.endswith('/role_assignments'):
+            assignments = []
+            for role_id in self.ASSIGNMENTS[query['user.id'][0]]:
+                role = {u'id': role_id}
+                if self.include_names and 'include_names' in query:
+                    role[u'name'] = self.ROLES[role_id]
+                assignments.append({u'role': role})
+            resp.json.return_value = {u'role_assignments': assignments}
+        elif url.path.endswith('/roles'):
+            resp.json.return_value = {u'roles': [
+                {u'id': role_id, u'name': name}
+                for role_id, name in self.ROLES.items()]}
+        else:
+            raise Exception('404')
+        return resp
+
+
+class AuthMiddlewareTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.keystone = FakeKeystone()
+        patcher = mock.patch('armada.api.middleware.get_keystone_session',
+                             return_value=self.keystone)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.middleware = AuthMiddleware()
+        self.auth = mock.Mock()
+        self.auth.get_access.side_effect = self._get_access
+        self.expires = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        self.middleware._get_user_auth = mock.Mock(return_value=self.auth)
+
+    def _get_access(self, session):
+        # tokens are named after their user
+        token = self.middleware._get_user_auth.call_args[0][0]
+        return mock.Mock(user_id=token, project_id='admin',
+                         expires=self.expires)
+
+    def _request(self, token='alice'):
+        headers = {'X-Auth-Token': token} if token else {}
+        req = falcon.Request(testing.create_environ(headers=headers))
+        self.middleware.process_request(req, None)
+        return req
+
+    def test_roles_resolved(self):
+        req = self._request()
+        self.assertEqual(['admin', 'member'], req.context['roles'])
+        self.assertEqual(['/v3/role_assignments'], self.keystone.requests)
+
+    def test_roles_resolved_without_include_names(self):
+        self.keystone.include_names = False
+        self.assertEqual(['admin', 'member'],
+                         self._request('alice').context['roles'])
+        self.assertEqual(['member', 'reader'],
+                         self._request('bob').context['roles'])
+
+        # one listing resolved the roles of both users
+        self.assertEqual(['/v3/role_assignments', '/v3/roles',
+                          '/v3/role_assignments'], self.keystone.requests)
+
+    def test_token_cached(self):
+        self._request()
+        req = self._request()
+
+        self.assertEqual(['admin', 'member'], req.context['roles'])
+        self.assertEqual(1, self.auth.get_access.call_count)
+        self.assertEqual(1, len(self.keystone.requests))
+
+    def test_expired_token_not_cached(self):
+        self.expires = datetime.datetime.utcnow() - datetime.timedelta(1)
+        self._request()
+        self._request()
+
+        self.assertEqual(2, self.auth.get_access.call_count)
+
+    def test_invalid_token(self):
+        self.auth.get_access.side_effect = Exception('401')
+        self.assertRaises(falcon.HTTPUnauthorized, self._request)
+        self.assertRaises(falcon.HTTPUnauthorized, self._request, None)
+        self.assertEqual(0, len(self.middleware.tokens))
@@ -0,0 +1,43 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from armada.api import wsgi
+
+
+class ArmadaApplicationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(wsgi.CONF.clear_override, 'api_workers')
+        self.addCleanup(wsgi.CONF.clear_override, 'api_worker_class')
+
+    def test_settings_from_conf(self):
+        wsgi.CONF.set_override('api_workers', 3)
+        wsgi.CONF.set_override('api_worker_class', 'sync')
+
+        app = wsgi.ArmadaApplication()
+
+        self.assertEqual(3, app.cfg.workers)
+        self.assertEqual('sync', app.cfg.settings['worker_class'].get())
+        self.assertEqual(['0.0.0.0:8000'], app.cfg.bind)
+        self.assertEqual(16, app.cfg.threads)
+        self.assertEqual(3600, app.cfg.timeout)
+        self.assertEqual(5, app.cfg.keepalive)
+        self.assertFalse(app.cfg.preload_app)
+
+    def test_load(self):
+        from armada.api.server import api
+
+        self.assertIs(api, wsgi.ArmadaApplication().load())
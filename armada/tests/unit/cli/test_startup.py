@@ -0,0 +1,46 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ['git', 'grpc', 'hapi', 'keystoneauth1', 'kubernetes',
+                 'requests']
+
+
+def imported_modules(*modules):
+    '''
+    Import modules in a fresh interpreter and return which of the heavy
+    third party modules were loaded as a side effect
+    '''
+    code = ('import json, sys\n'
+            '{}\n'
+            'print(json.dumps([m for m in {} if m in sys.modules]))').format(
+                '\n'.join('import ' + m for m in modules), HEAVY_MODULES)
+    return json.loads(subprocess.check_output([sys.executable, '-c', code]))
+
+
+class StartupImportTestCase(unittest.TestCase):
+
+    def test_commands_defer_heavy_imports(self):
+        self.assertEqual(imported_modules('armada.shell',
+                                          'armada.cli.apply',
+                                          'armada.cli.tiller',
+                                          'armada.cli.validate'), [])
+
+    def test_tiller_does_not_import_kubernetes(self):
+        self.assertEqual(imported_modules('armada.handlers.armada'),
+                         ['grpc', 'hapi'])
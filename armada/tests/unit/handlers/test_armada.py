@@ -96,6 +96,65 @@ class ArmadaTestCase(unittest.TestCase):
                     chart.get('chart').get('source_dir')[1],
                     CHART_SOURCES[counter][1])
 
+    @mock.patch('armada.handlers.armada.Tiller')
+    def test_show_diff_ignores_order(self, mock_tiller):
+        '''Test show_diff() compares chart parts by name'''
+        from google.protobuf.any_pb2 import Any
+        from hapi.chart.chart_pb2 import Chart
+        from hapi.chart.template_pb2 import Template
+
+        def chart(templates, files=()):
+            return Chart(
+                templates=[Template(name=n, data=d) for n, d in templates],
+                files=[Any(type_url=n, value=v) for n, v in files])
+
+        armada = Armada('')
+        release = mock.Mock(release='test')
+        installed = chart([('b.yaml', 'b'), ('a.yaml', 'a')])
+        values = yaml.safe_dump({})
+
+        self.assertFalse(armada.show_diff(
+            release, installed, values,
+            chart([('a.yaml', 'a'), ('b.yaml', 'b')]).SerializeToString(),
+            {}))
+        self.assertTrue(armada.show_diff(
+            release, installed, values,
+            chart([('a.yaml', 'a'), ('b.yaml', 'c')]).SerializeToString(),
+            {}))
+        self.assertTrue(armada.show_diff(
+            release, installed, values,
+            chart([('a.yaml', 'a'), ('b.yaml', 'b')],
+                  [('files/x', 'x')]).SerializeToString(),
+            {}))
+
+    @mock.patch.object(Armada, 'tag_cloned_repo')
+    @mock.patch.object(Armada, 'get_armada_manifest')
+    @mock.patch('armada.handlers.armada.lint')
+    @mock.patch('armada.handlers.armada.Tiller')
+    def test_pre_flight_purges_failed_releases(self, mock_tiller, mock_lint,
+                                               mock_manifest, mock_tag):
+        '''Test pre-flight ops purge failed releases by release name'''
+        from armada.const import STATUS_DEPLOYED, STATUS_FAILED
+
+        armada = Armada('')
+        mock_manifest.return_value = {'armada': {
+            'release_prefix': 'armada',
+            'chart_groups': [{'chart_group': [
+                {'chart': {'chart_name': 'db', 'release': 'mariadb',
+                           'dependencies': []}},
+                {'chart': {'chart_name': 'kv', 'release': 'etcd',
+                           'dependencies': []}}]}]}}
+        armada.tiller.list_charts.return_value = [
+            ('armada-mariadb', None, None, None, STATUS_FAILED),
+            ('armada-db', None, None, None, STATUS_FAILED),
+            ('armada-etcd', None, None, None, STATUS_DEPLOYED)]
+        armada.tiller.uninstall_releases.return_value = {}
+
+        armada.pre_flight_ops()
+
+        armada.tiller.uninstall_releases.assert_called_once_with(
+            ['armada-mariadb'])
+
     @unittest.skip('temp')
     @mock.patch('armada.handlers.armada.git')
     @mock.patch('armada.handlers.armada.lint')
@@ -177,3 +236,59 @@ class ArmadaTestCase(unittest.TestCase):
     def test_upgrade(self):
         '''Test upgrade functionality from the sync() method'''
         # TODO
+
+    @mock.patch.object(Armada, 'sync_chart')
+    @mock.patch.object(Armada, 'post_flight_ops')
+    @mock.patch.object(Armada, 'pre_flight_ops')
+    @mock.patch('armada.handlers.armada.Tiller')
+    def test_sync_events(self, mock_tiller, mock_pre_flight,
+                         mock_post_flight, mock_sync_chart):
+        '''Test sync() reports the progress of every chart to listeners'''
+        armada = Armada('')
+        armada.config = {'armada': {
+            'release_prefix': 'armada',
+            'chart_groups': [{'chart_group': [
+                {'chart': {'release': 'test_chart_1'}},
+                {'chart': {'release': 'test_chart_2'}}]}]}}
+        armada.tiller.list_charts.return_value = []
+        events = []
+        armada.add_listener(events.append)
+
+        mock_sync_chart.side_effect = ['installed', Exception('failed')]
+
+        self.assertRaises(Exception, armada.sync)
+
+        self.assertEqual(['installed', 'failed'],
+                         [e['event'] for e in events])
+        self.assertEqual(['test_chart_1', 'test_chart_2'],
+                         [e['release'] for e in events])
+        self.assertEqual('failed', events[1]['error'])
+        self.assertTrue(all(e['duration'] >= 0 for e in events))
+
+    @mock.patch.object(Armada, 'post_flight_ops')
+    @mock.patch.object(Armada, 'pre_flight_ops')
+    @mock.patch('armada.handlers.armada.Tiller')
+    def test_sync_timeline(self, mock_tiller, mock_pre_flight,
+                           mock_post_flight):
+        '''Test sync() records its phases and writes the timeline'''
+        import json
+        import os
+        import tempfile
+
+        fd, timeline_file = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, timeline_file)
+        armada = Armada('', timeline_file=timeline_file)
+        armada.config = {'armada': {
+            'release_prefix': 'armada',
+            'chart_groups': [{'chart_group': []}]}}
+        armada.tiller.list_charts.return_value = []
+
+        with mock.patch.object(Armada, 'sync_chart'):
+            armada.sync()
+
+        with open(timeline_file) as f:
+            timeline = json.load(f)
+        self.assertEqual(['pre-flight', 'post-flight'],
+                         [span['name'] for span in timeline['spans']])
+        self.assertIs(armada.timeline, armada.tiller.timeline)
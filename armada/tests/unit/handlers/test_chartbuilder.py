@@ -11,9 +11,15 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+import shutil
+import tempfile
 import unittest
+
 import mock
+from supermutes.dot import dotify
 
+from armada.handlers import chartbuilder as cb
 from armada.handlers.chartbuilder import ChartBuilder
 
 
@@ -84,3 +90,242 @@ class ChartBuilderTestCase(unittest.TestCase):
 
         self.assertIsNotNone(resp)
         self.assertIsInstance(resp, basestring)
+
+    def _write_chart(self, files):
+        chart_dir = tempfile.mkdtemp(prefix='armada-chart')
+        self.addCleanup(shutil.rmtree, chart_dir)
+        for path, data in files.items():
+            path = os.path.join(chart_dir, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(data)
+        return dotify({'chart_name': 'test',
+                       'source_dir': (chart_dir, ''),
+                       'dependencies': []})
+
+    def test_get_templates_honors_helmignore(self):
+        chart = self._write_chart({
+            '.helmignore': '*.bak\ntemplates/tests/\n!templates/keep.bak\n',
+            'Chart.yaml': self.chart_yaml,
+            'templates/deployment.yaml': 'deployment',
+            'templates/deployment.yaml.bak': 'backup',
+            'templates/keep.bak': 'kept',
+            'templates/nested/service.yaml': 'service',
+            'templates/tests/test-pod.yaml': 'test',
+        })
+
+        chartbuilder = ChartBuilder(chart)
+
+        match = mock.Mock(wraps=chartbuilder.ignore_rules.match)
+        chartbuilder.ignore_rules.match = match
+
+        templates = chartbuilder.get_templates()
+        checked = [c[0][0] for c in match.call_args_list]
+
+        self.assertEqual(
+            ['deployment.yaml', 'keep.bak', 'nested/service.yaml'],
+            sorted(t.name for t in templates))
+        # the ignored directory is pruned instead of filtered file by file
+        self.assertIn('templates/tests', checked)
+        self.assertNotIn('templates/tests/test-pod.yaml', checked)
+
+    def test_get_templates_sorted(self):
+        names = ['b.yaml', 'a/z.yaml', 'a.yaml', 'c/d/e.yaml', 'a/b.yaml']
+        chart = self._write_chart(dict(
+            [('Chart.yaml', self.chart_yaml)] +
+            [('templates/' + name, name) for name in names]))
+
+        with mock.patch.object(cb, 'READ_WORKERS', 2):
+            templates = ChartBuilder(chart).get_templates()
+
+        self.assertEqual(sorted(names), [t.name for t in templates])
+        self.assertEqual(sorted(names), [t.data for t in templates])
+
+    def test_get_files(self):
+        chart = self._write_chart({
+            '.helmignore': '*.bak\n',
+            'Chart.yaml': self.chart_yaml,
+            'values.yaml': self.chart_value,
+            'requirements.yaml': 'dependencies: []\n',
+            'templates/deployment.yaml': 'deployment',
+            'charts/dep/Chart.yaml': self.chart_yaml,
+            'files/config.conf': 'config',
+            'files/config.conf.bak': 'backup',
+            'files/empty': '',
+            'scripts/large.bin': 'x' * 64,
+        })
+
+        files = ChartBuilder(chart).get_files()
+
+        self.assertEqual(
+            ['.helmignore', 'files/config.conf', 'files/empty',
+             'requirements.yaml', 'scripts/large.bin'],
+            [f.type_url for f in files])
+        self.assertEqual(
+            [b'*.bak\n', b'config', b'', b'dependencies: []\n', b'x' * 64],
+            [f.value for f in files])
+
+    def test_vcs_directories_pruned(self):
+        chart = self._write_chart({
+            '.helmignore': '*.bak\n',
+            'Chart.yaml': self.chart_yaml,
+            '.git/HEAD': 'ref: refs/heads/master',
+            '.git/objects/ab/cdef': 'object',
+            '.hg/store/data': 'data',
+            'files/.svn/entries': 'entries',
+            'files/config.conf': 'config',
+            'templates/service.yaml': 'service',
+            'templates/.git/config': 'config',
+        })
+        chartbuilder = ChartBuilder(chart)
+
+        self.assertEqual(
+            ['.helmignore', 'files/config.conf'],
+            [f.type_url for f in chartbuilder.get_files()])
+        self.assertEqual(['service.yaml'],
+                         [t.name for t in chartbuilder.get_templates()])
+
+    def test_files_packed_on_request(self):
+        chart = self._write_chart({
+            'Chart.yaml': self.chart_yaml,
+            'files/config.conf': 'config',
+        })
+
+        self.assertEqual([], list(ChartBuilder(chart).get_helm_chart().files))
+
+        chart['pack_files'] = True
+        self.assertEqual(
+            ['files/config.conf'],
+            [f.type_url for f in ChartBuilder(chart).get_helm_chart().files])
+
+    def test_get_files_size_warning(self):
+        chart = self._write_chart({
+            'Chart.yaml': self.chart_yaml,
+            'files/large.bin': 'x' * 64,
+        })
+
+        with mock.patch.object(cb, 'MAX_MESSAGE_LENGTH', 64):
+            with mock.patch.object(cb, 'LOG') as mock_log:
+                ChartBuilder(chart).get_files()
+
+        self.assertTrue(mock_log.warn.called)
+
+    def test_payload_sizes(self):
+        chart = self._write_chart({
+            'Chart.yaml': self.chart_yaml,
+            'values.yaml': self.chart_value,
+            'templates/small.yaml': 'x' * 10,
+            'templates/large.yaml': 'x' * 1000,
+            'files/data.bin': 'x' * 100,
+        })
+        chart['pack_files'] = True
+        chartbuilder = ChartBuilder(chart)
+
+        sizes = chartbuilder.get_payload_sizes()
+        contributors = chartbuilder.get_payload_contributors(limit=3)
+
+        self.assertEqual(0, sizes['dependencies'])
+        self.assertGreater(sizes['templates'], 1010)
+        self.assertGreater(sizes['files'], 100)
+        self.assertEqual(len(chartbuilder.dump()), sizes['total'])
+        self.assertEqual(
+            [('template', 'large.yaml'), ('values', 'values.yaml'),
+             ('file', 'files/data.bin')],
+            [c[:2] for c in contributors])
+
+    def _write_dependency_tree(self):
+        dep = self._write_chart({
+            'Chart.yaml': self.chart_yaml,
+            'templates/_helpers.tpl': 'helpers',
+        })
+        nested = self._write_chart({
+            'Chart.yaml': self.chart_yaml,
+            'values.yaml': self.chart_value,
+            'templates/service.yaml': 'service',
+            'files/config.conf': 'config',
+        })
+        nested['pack_files'] = True
+        nested['dependencies'] = [{'chart': dep}]
+        parents = []
+        for name in ('first', 'second'):
+            parent = self._write_chart({
+                'Chart.yaml': self.chart_yaml,
+                'values.yaml': self.chart_value,
+                'templates/%s.yaml' % name: name,
+                'files/%s.conf' % name: name,
+            })
+            parent['release'] = name
+            parent['pack_files'] = True
+            parent['dependencies'] = [{'chart': dep}, {'chart': nested}]
+            parents.append(dotify(parent))
+        return parents
+
+    def test_dependencies_built_once(self):
+        first, second = self._write_dependency_tree()
+        cache = {}
+
+        with mock.patch.object(ChartBuilder, 'get_templates',
+                               autospec=True,
+                               side_effect=ChartBuilder.get_templates) as m:
+            ChartBuilder(first, dependency_cache=cache).get_helm_chart()
+            ChartBuilder(second, dependency_cache=cache).get_helm_chart()
+
+        # two parents and two distinct dependencies
+        self.assertEqual(4, m.call_count)
+        self.assertEqual(2, len(cache))
+
+    def test_dump_splices_dependencies(self):
+        cache = {}
+        for chart in self._write_dependency_tree():
+            chartbuilder = ChartBuilder(chart, dependency_cache=cache)
+
+            self.assertEqual(
+                chartbuilder.get_helm_chart().SerializeToString(),
+                chartbuilder.dump())
+
+    def test_encode_field_long_values(self):
+        from hapi.chart.chart_pb2 import Chart
+        from hapi.chart.template_pb2 import Template
+
+        template = Template(name='large', data='x' * 100000)
+        chart = Chart(templates=[template])
+
+        self.assertEqual(
+            chart.SerializeToString(),
+            cb.encode_field(cb.CHART_FIELD_TAGS['templates'],
+                            template.SerializeToString()))
+
+    def test_digests(self):
+        first, second = self._write_dependency_tree()
+        cache = {}
+        first_builder = ChartBuilder(first, dependency_cache=cache)
+        second_builder = ChartBuilder(second, dependency_cache=cache)
+
+        data, digests = first_builder.dump(with_digests=True)
+
+        self.assertEqual(first_builder.dump(), data)
+        self.assertEqual(['first.yaml'], list(digests['templates']))
+        self.assertEqual(cb.digest('first'),
+                         digests['templates']['first.yaml'])
+        self.assertEqual(['files/first.conf'], list(digests['files']))
+        self.assertEqual(2, len(digests['dependencies']))
+        # shared dependencies have the same digests in every parent
+        self.assertEqual(digests['dependencies'],
+                         second_builder.get_digests()['dependencies'])
+        self.assertNotEqual(digests['root'],
+                            second_builder.get_digests()['root'])
+
+    def test_digest_root_stable(self):
+        first, _ = self._write_dependency_tree()
+
+        root = ChartBuilder(first).get_digests()['root']
+
+        self.assertEqual(root, ChartBuilder(first).get_digests()['root'])
+
+        with open(os.path.join(first.dependencies[0].chart.source_dir[0],
+                               'templates', '_helpers.tpl'), 'w') as f:
+            f.write('changed')
+
+        # a change in a dependency changes the root of the parent
+        self.assertNotEqual(root, ChartBuilder(first).get_digests()['root'])
@@ -0,0 +1,156 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+import unittest
+
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from armada.handlers import informer
+from armada.handlers.informer import Informer, parse_label_selector
+
+
+def make_pod(name, labels, resource_version='1'):
+    return client.V1Pod(metadata=client.V1ObjectMeta(
+        name=name, labels=labels, resource_version=resource_version))
+
+
+class LabelSelectorTestCase(unittest.TestCase):
+
+    def test_parse_equality(self):
+        self.assertEqual(
+            parse_label_selector('release_name=foo, app==bar,tier!=web'),
+            [('release_name', 'in', set(['foo'])),
+             ('app', 'in', set(['bar'])),
+             ('tier', 'notin', set(['web']))])
+
+    def test_parse_set_and_exists(self):
+        self.assertEqual(
+            parse_label_selector('env in (prod, qa),app notin (x),tier,!gone'),
+            [('env', 'in', set(['prod', 'qa'])),
+             ('app', 'notin', set(['x'])),
+             ('tier', 'exists', set()),
+             ('gone', '!exists', set())])
+
+    def test_parse_empty(self):
+        self.assertEqual(parse_label_selector(''), [])
+
+    def test_parse_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_label_selector('a=b=c')
+
+
+class InformerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.list_func = mock.Mock(__name__='list_namespaced_pod')
+        self.list_func.return_value = client.V1PodList(
+            metadata=client.V1ListMeta(resource_version='10'),
+            items=[make_pod('a-1', {'release_name': 'a', 'app': 'api'}),
+                   make_pod('a-2', {'release_name': 'a', 'app': 'db'}),
+                   make_pod('b-1', {'release_name': 'b', 'app': 'api'}),
+                   make_pod('c-1', None)])
+
+        self.informer = Informer(self.list_func, 'test')
+        self.informer._relist()
+
+    def names(self, label_selector=''):
+        resp = self.informer.list(label_selector)
+        self.assertIsInstance(resp, client.V1PodList)
+        return [x.metadata.name for x in resp.items]
+
+    def test_list_uses_single_api_call(self):
+        self.assertEqual(self.names(), ['a-1', 'a-2', 'b-1', 'c-1'])
+        self.assertEqual(self.names('release_name=a'), ['a-1', 'a-2'])
+        self.assertEqual(self.names('release_name=a, app=db'), ['a-2'])
+        self.assertEqual(self.names('app in (api, db),release_name!=a'),
+                         ['b-1'])
+        self.assertEqual(self.names('!app'), ['c-1'])
+        self.list_func.assert_called_once_with('test')
+
+    def test_watch_events_update_index(self):
+        self.informer._handle_event({
+            'type': 'MODIFIED',
+            'object': make_pod('a-1', {'release_name': 'b'}, '11')})
+        self.informer._handle_event({
+            'type': 'DELETED',
+            'object': make_pod('b-1', {'release_name': 'b'}, '12')})
+        self.informer._handle_event({
+            'type': 'ADDED',
+            'object': make_pod('d-1', {'release_name': 'a'}, '13')})
+
+        self.assertEqual(self.names('release_name=a'), ['a-2', 'd-1'])
+        self.assertEqual(self.names('release_name=b'), ['a-1'])
+        self.assertEqual(self.informer._resource_version, '13')
+
+    def test_watch_error_requests_relist(self):
+        self.assertFalse(self.informer._handle_event({
+            'type': 'ERROR', 'object': {'code': 410}}))
+
+    def test_list_returns_copies(self):
+        resp = self.informer.list('release_name=b')
+        resp.items[0].metadata.labels['release_name'] = 'changed'
+
+        self.assertEqual(self.names('release_name=b'), ['b-1'])
+
+
+class InformerSyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.list_func = mock.Mock(__name__='list_namespaced_pod')
+        self.list_func.return_value = client.V1PodList(
+            metadata=client.V1ListMeta(resource_version='10'), items=[])
+
+        self.informer = Informer(self.list_func, 'test',
+                                 clock=lambda: self.now)
+        self.informer._thread = mock.Mock()
+        self.informer._thread.is_alive.return_value = True
+
+    def test_not_synced_before_list(self):
+        self.assertFalse(self.informer.is_synced())
+
+        self.informer._relist()
+        self.assertTrue(self.informer.is_synced())
+
+    def test_failed_watch_bounds_staleness(self):
+        self.informer._relist()
+        self.assertEqual(5, self.informer._watch_failed())
+        self.assertEqual(10, self.informer._watch_failed())
+
+        self.now += informer.MAX_STALENESS
+        self.assertTrue(self.informer.is_synced())
+        self.now += 1
+        self.assertFalse(self.informer.is_synced())
+
+        # a working watch syncs the cache again
+        self.informer._relist()
+        self.informer._handle_event({
+            'type': 'ADDED', 'object': make_pod('a-1', {}, '11')})
+        self.now += informer.WATCH_TIMEOUT
+        self.assertTrue(self.informer.is_synced())
+        self.assertEqual(5, self.informer._watch_failed())
+
+    @mock.patch('kubernetes.watch.Watch')
+    def test_forbidden_watch_stops_informer(self, mock_watch):
+        mock_watch.return_value.stream.side_effect = ApiException(status=403)
+        self.informer._relist()
+
+        self.informer._run()
+
+        self.assertTrue(self.informer._stopped.is_set())
+        self.informer._thread.is_alive.return_value = False
+        self.assertFalse(self.informer.is_synced())
+        self.list_func.assert_called_once_with('test')
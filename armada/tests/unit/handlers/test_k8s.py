@@ -0,0 +1,54 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+import unittest
+
+from armada.handlers import k8s
+from armada.handlers.k8s import K8s
+from armada.handlers.tiller import Tiller
+
+
+class K8sTestCase(unittest.TestCase):
+
+    def setUp(self):
+        k8s._api_clients.clear()
+
+    def tearDown(self):
+        k8s._api_clients.clear()
+
+    @mock.patch('kubernetes.client.ExtensionsV1beta1Api')
+    @mock.patch('kubernetes.client.BatchV1Api')
+    @mock.patch('kubernetes.client.CoreV1Api')
+    @mock.patch('kubernetes.config.load_kube_config')
+    def test_clients_created_lazily(self, mock_load, mock_core, mock_batch,
+                                    mock_extensions):
+        first = K8s()
+        second = K8s()
+        self.assertFalse(mock_load.called)
+
+        self.assertIs(first.client, second.client)
+        self.assertIs(first.batch_api, second.batch_api)
+        mock_load.assert_called_once_with()
+        mock_core.assert_called_once_with()
+        mock_batch.assert_called_once_with()
+        self.assertFalse(mock_extensions.called)
+
+    @mock.patch('armada.handlers.tiller.grpc')
+    @mock.patch('kubernetes.config.load_kube_config')
+    def test_tiller_host_skips_kube_config(self, mock_load, mock_grpc):
+        tiller = Tiller(tiller_host='10.0.0.1')
+
+        self.assertTrue(tiller.tiller_status())
+        self.assertFalse(mock_load.called)
@@ -1,3 +1,4 @@
+import grpc
 import mock
 import unittest
 
@@ -47,4 +48,238 @@ class TillerTestCase(unittest.TestCase):
         (mock_stub(tiller.channel).InstallRelease
          .assert_called_with(release_request,
                              tiller.timeout,
-                             metadata=tiller.metadata))
+                             metadata=tiller.compressed_metadata))
+
+    @mock.patch('armada.handlers.tiller.ReleaseServiceStub')
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_list_releases_pages(self, mock_channel, mock_stub):
+        from hapi.release.release_pb2 import Release
+        from hapi.services.tiller_pb2 import ListReleasesResponse
+
+        pages = {
+            '': ListReleasesResponse(
+                next='c', releases=[Release(name='a'), Release(name='b')]),
+            'c': ListReleasesResponse(releases=[Release(name='c')]),
+        }
+        list_releases = mock_stub.return_value.ListReleases
+        list_releases.side_effect = \
+            lambda request, *args, **kwargs: iter([pages[request.offset]])
+
+        tiller = Tiller(tiller_host='10.0.0.1')
+
+        self.assertEqual(['a', 'b', 'c'],
+                         [r.name for r in tiller.list_releases()])
+        self.assertEqual(['', 'c'], [call[0][0].offset for call in
+                                     list_releases.call_args_list])
+
+    def _rpc_error(self, code):
+        error = grpc.RpcError()
+        error.code = mock.Mock(return_value=code)
+        return error
+
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_send_chart_compressed(self, mock_channel):
+        tiller = Tiller(tiller_host='10.0.0.1')
+        rpc = mock.Mock()
+
+        tiller._send_chart(rpc, 'request')
+
+        rpc.assert_called_once_with('request', tiller.timeout,
+                                    metadata=tiller.compressed_metadata)
+        self.assertIn((b'grpc-internal-encoding-request', 'gzip'),
+                      tiller.compressed_metadata)
+
+    @mock.patch('armada.handlers.tiller._uncompressed_targets', set())
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_send_chart_compression_fallback(self, mock_channel):
+        tiller = Tiller(tiller_host='10.0.0.1')
+        rpc = mock.Mock(side_effect=[
+            self._rpc_error(grpc.StatusCode.UNIMPLEMENTED), 'response'])
+
+        self.assertEqual('response', tiller._send_chart(rpc, 'request'))
+        rpc.assert_called_with('request', tiller.timeout,
+                               metadata=tiller.metadata)
+        # compression stays disabled for later requests
+        self.assertIsNone(tiller.compression)
+        self.assertEqual(tiller.metadata, tiller.compressed_metadata)
+
+        # and for later Tiller objects talking to the same Tiller
+        self.assertIsNone(Tiller(tiller_host='10.0.0.1').compression)
+        self.assertEqual('gzip', Tiller(tiller_host='10.0.0.2').compression)
+
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_send_chart_other_errors_raised(self, mock_channel):
+        tiller = Tiller(tiller_host='10.0.0.1')
+        rpc = mock.Mock(side_effect=self._rpc_error(
+            grpc.StatusCode.UNAVAILABLE))
+
+        self.assertRaises(grpc.RpcError, tiller._send_chart, rpc, 'request')
+        self.assertEqual(1, rpc.call_count)
+        self.assertEqual('gzip', tiller.compression)
+
+    def test_observe_rpc_counts_status(self):
+        from armada.handlers import tiller
+
+        before = tiller.TILLER_RPCS.value(method='UninstallRelease',
+                                          status='UNAVAILABLE')
+        request = mock.Mock()
+        request.ByteSize.return_value = 100
+        sent = tiller.TILLER_SENT_BYTES.value(method='UninstallRelease')
+
+        with self.assertRaises(grpc.RpcError):
+            with tiller.observe_rpc('UninstallRelease', request):
+                raise self._rpc_error(grpc.StatusCode.UNAVAILABLE)
+
+        self.assertEqual(before + 1, tiller.TILLER_RPCS.value(
+            method='UninstallRelease', status='UNAVAILABLE'))
+        self.assertEqual(sent + 100, tiller.TILLER_SENT_BYTES.value(
+            method='UninstallRelease'))
+
+    manifest = '''---
+# Source: chart/templates/daemonset-a.yaml
+apiVersion: extensions/v1beta1
+kind: DaemonSet
+metadata:
+  name: daemonset-a
+spec:
+  template:
+    metadata:
+      labels: {}
+---
+# Source: chart/templates/daemonset-b.yaml
+apiVersion: extensions/v1beta1
+kind: DaemonSet
+metadata:
+  name: daemonset-b
+spec:
+  template:
+    metadata:
+      labels: {}
+---
+apiVersion: v1
+kind: ConfigMap
+metadata:
+  name: daemonset-a
+'''
+
+    def _daemonset(self, name):
+        ds = mock.Mock()
+        ds.metadata.name = name
+        ds.metadata.labels = {'release_name': 'release'}
+        return ds
+
+    @mock.patch('armada.handlers.tiller.ReleaseServiceStub')
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_pre_update_actions_render_once(self, mock_channel, mock_stub):
+        from hapi.chart.chart_pb2 import Chart
+        from hapi.chart.config_pb2 import Config
+
+        install = mock_stub.return_value.InstallRelease
+        install.return_value.release.manifest = self.manifest
+        tiller = Tiller(tiller_host='10.0.0.1')
+        tiller.k8s = mock.Mock()
+        tiller.k8s.get_namespace_daemonset.return_value.items = [
+            self._daemonset('daemonset-a'), self._daemonset('daemonset-b')]
+        actions = {'update': [{'name': 'daemonset-a', 'type': 'daemonset'},
+                              {'name': 'daemonset-b', 'type': 'daemonset'}]}
+
+        with mock.patch.object(tiller, 'delete_resources'):
+            tiller._pre_update_actions(actions, 'release', 'default',
+                                       Chart(), False, Config())
+
+        self.assertEqual(1, install.call_count)
+        request = install.call_args[0][0]
+        self.assertTrue(request.dry_run)
+        # the release is installed, it is rendered under another name
+        self.assertTrue(request.name.startswith('release-render-'))
+
+        created = [call[1]['template'] for call in
+                   tiller.k8s.create_daemon_action.call_args_list]
+        self.assertEqual(['daemonset-a', 'daemonset-b'],
+                         [t['metadata']['name'] for t in created])
+        self.assertEqual({'release_name': 'release'},
+                         created[0]['metadata']['labels'])
+
+    @mock.patch('armada.handlers.tiller.ReleaseServiceStub')
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_chart_templates_are_copies(self, mock_channel, mock_stub):
+        from hapi.chart.config_pb2 import Config
+        from armada.handlers import tiller as tiller_module
+
+        install = mock_stub.return_value.InstallRelease
+        install.return_value.release.manifest = self.manifest
+        tiller = Tiller(tiller_host='10.0.0.1')
+        release = 'r' * 60
+        manifest = tiller.get_rendered_manifest(release, 'default', None,
+                                                Config())
+
+        self.assertLessEqual(len(install.call_args[0][0].name),
+                             tiller_module.MAX_RELEASE_NAME)
+
+        first = tiller.get_chart_templates(
+            'daemonset-a', 'upgrade', release, 'default', None, False,
+            Config(), kind='DaemonSet', manifest=manifest)
+        first['metadata']['labels'] = {'changed': 'true'}
+        again = tiller.get_chart_templates(
+            'daemonset-a', 'upgrade', release, 'default', None, False,
+            Config(), manifest=manifest)
+        config_map = tiller.get_chart_templates(
+            'daemonset-a', 'upgrade', release, 'default', None, False,
+            Config(), kind='ConfigMap', manifest=manifest)
+
+        self.assertNotIn('labels', again['metadata'])
+        self.assertEqual('ConfigMap', config_map['kind'])
+        self.assertEqual(1, install.call_count)
+
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_uninstall_releases_concurrently(self, mock_channel):
+        import threading
+        import time
+
+        tiller = Tiller(tiller_host='10.0.0.1')
+        releases = ['release-%02d' % i for i in range(10)]
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def uninstall(release, disable_hooks=False, purge=True):
+            with lock:
+                running.append(release)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(release)
+            if release == 'release-03':
+                raise Exception('failed')
+
+        with mock.patch.object(tiller, 'uninstall_release',
+                               side_effect=uninstall):
+            results = tiller.uninstall_releases(releases, max_workers=4)
+
+        self.assertEqual(releases, list(results))
+        self.assertEqual(['release-03'],
+                         [r for r, error in results.items() if error])
+        self.assertEqual(4, max(peak))
+
+    @mock.patch('armada.handlers.tiller.grpc.insecure_channel')
+    def test_chart_cleanup(self, mock_channel):
+        from armada.exceptions import tiller_exceptions
+
+        tiller = Tiller(tiller_host='10.0.0.1')
+        releases = []
+        for name in ('armada-keep', 'armada-stale', 'armada-broken',
+                     'other-release'):
+            release = mock.Mock()
+            release.name = name
+            releases.append(release)
+        groups = [{'chart_group': [{'chart': {'release': 'keep'}}]}]
+
+        with mock.patch.object(tiller, 'list_releases',
+                               return_value=releases), \
+                mock.patch.object(tiller, 'uninstall_releases') as mock_un:
+            mock_un.return_value = {'armada-broken': Exception(),
+                                    'armada-stale': None}
+            self.assertRaises(tiller_exceptions.ReleaseUninstallException,
+                              tiller.chart_cleanup, 'armada', groups)
+
+        mock_un.assert_called_once_with(['armada-broken', 'armada-stale'])
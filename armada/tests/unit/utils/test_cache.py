@@ -0,0 +1,52 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from armada.utils.cache import TTLCache
+
+
+class TTLCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = TTLCache(max_size=2, ttl=60, clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2, expires=self.now + 10)
+
+        self.now += 30
+        self.assertEqual(1, self.cache.get('a'))
+        # expired before the ttl because of its own expiry
+        self.assertIsNone(self.cache.get('b'))
+
+        self.now += 30
+        self.assertEqual('gone', self.cache.get('a', 'gone'))
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(3, self.cache.pop('c'))
+
+    def test_disabled(self):
+        cache = TTLCache(max_size=0, ttl=60)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
@@ -0,0 +1,104 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from armada.utils.helmignore import HelmIgnore
+
+
+class HelmIgnoreTestCase(unittest.TestCase):
+
+    def test_comments_and_blank_lines(self):
+        rules = HelmIgnore(['# comment', '', '   ', r'\#literal'])
+
+        self.assertEqual(1, len(rules))
+        self.assertTrue(rules.match('#literal'))
+        self.assertFalse(rules.match('comment'))
+
+    def test_basename_matches_at_any_depth(self):
+        rules = HelmIgnore(['*.bak', 'secret.yaml'])
+
+        self.assertTrue(rules.match('values.bak'))
+        self.assertTrue(rules.match('templates/deep/dir/file.bak'))
+        self.assertTrue(rules.match('templates/secret.yaml'))
+        self.assertFalse(rules.match('templates/secret.yaml.tpl'))
+        self.assertFalse(rules.match('templates/bak'))
+
+    def test_slash_anchors_to_chart_directory(self):
+        rules = HelmIgnore(['templates/tests/*', '/README.md'])
+
+        self.assertTrue(rules.match('templates/tests/pod.yaml'))
+        self.assertFalse(rules.match('templates/tests/sub/pod.yaml'))
+        self.assertFalse(rules.match('charts/dep/templates/tests/pod.yaml'))
+        self.assertTrue(rules.match('README.md'))
+        self.assertFalse(rules.match('docs/README.md'))
+
+    def test_double_asterisk(self):
+        rules = HelmIgnore(['**/*.tmp', 'docs/**', 'a/**/b'])
+
+        self.assertTrue(rules.match('x.tmp'))
+        self.assertTrue(rules.match('templates/x/y.tmp'))
+        self.assertTrue(rules.match('docs/index/page.md'))
+        self.assertFalse(rules.match('docs'))
+        self.assertTrue(rules.match('a/b'))
+        self.assertTrue(rules.match('a/x/y/b'))
+        self.assertFalse(rules.match('a/x/y/c'))
+
+    def test_single_character_and_classes(self):
+        rules = HelmIgnore(['file?.yaml', '[abc].txt', '[!0-9].md'])
+
+        self.assertTrue(rules.match('file1.yaml'))
+        self.assertFalse(rules.match('file10.yaml'))
+        self.assertTrue(rules.match('b.txt'))
+        self.assertFalse(rules.match('d.txt'))
+        self.assertTrue(rules.match('x.md'))
+        self.assertFalse(rules.match('1.md'))
+
+    def test_directory_only_rules(self):
+        rules = HelmIgnore(['build/'])
+
+        self.assertTrue(rules.match('build', is_dir=True))
+        self.assertTrue(rules.match('templates/build', is_dir=True))
+        self.assertFalse(rules.match('build'))
+        self.assertTrue(rules.ignored('build/output.yaml'))
+
+    def test_negation_last_match_wins(self):
+        rules = HelmIgnore(['*.yaml', '!keep.yaml', 'keep.yaml'])
+
+        self.assertTrue(rules.match('keep.yaml'))
+
+        rules = HelmIgnore(['*.yaml', '!keep.yaml'])
+
+        self.assertFalse(rules.match('templates/keep.yaml'))
+        self.assertTrue(rules.match('templates/drop.yaml'))
+
+    def test_ignored_directory_cannot_be_reincluded(self):
+        rules = HelmIgnore(['tests/', '!tests/keep.yaml'])
+
+        self.assertTrue(rules.ignored('tests/keep.yaml'))
+        self.assertTrue(rules.ignored('tests/other.yaml'))
+        self.assertFalse(rules.ignored('templates/keep.yaml'))
+
+    def test_escaped_characters(self):
+        rules = HelmIgnore([r'\!important', r'star\*'])
+
+        self.assertTrue(rules.match('!important'))
+        self.assertTrue(rules.match('star*'))
+        self.assertFalse(rules.match('starfish'))
+
+    def test_no_rules(self):
+        rules = HelmIgnore([])
+
+        self.assertEqual(0, len(rules))
+        self.assertFalse(rules.ignored('templates/a.yaml'))
@@ -0,0 +1,112 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+
+from armada.utils import manifest_index
+from armada.utils.manifest_index import ManifestIndex
+
+MANIFEST = '''
+---
+# Source: chart/templates/service.yaml
+apiVersion: v1
+kind: Service
+metadata:
+  labels:
+    name: not-the-name
+  name: "keystone-api"
+spec:
+  ports:
+  - port: 5000
+---
+# Source: chart/templates/configmap.yaml
+apiVersion: v1
+kind: ConfigMap
+metadata:
+    namespace: openstack
+    name: keystone-etc   # trailing comment
+data:
+  script: |
+    kind: Secret
+    ---
+    metadata:
+      name: inside-block
+---
+# Source: chart/templates/empty.yaml
+---
+{"apiVersion": "v1", "kind": "Secret", "metadata": {"name": "flow"}}
+--- # comment after the separator
+apiVersion: v1
+kind: Service
+metadata:
+  name: keystone-api
+spec: duplicate
+'''
+
+
+class ManifestIndexTestCase(unittest.TestCase):
+
+    def test_split_documents(self):
+        documents = manifest_index.split_documents(MANIFEST)
+
+        # the empty document is dropped, indented separators are content
+        self.assertEqual(5, len(documents))
+        self.assertIn('script: |', documents[1])
+
+    def test_peek(self):
+        documents = manifest_index.split_documents(MANIFEST)
+
+        self.assertEqual(('Service', 'keystone-api'),
+                         manifest_index.peek(documents[0]))
+        self.assertEqual(('ConfigMap', 'keystone-etc'),
+                         manifest_index.peek(documents[1]))
+        self.assertEqual((None, None), manifest_index.peek(documents[3]))
+
+    def test_index_keys(self):
+        index = ManifestIndex(MANIFEST)
+
+        self.assertEqual(
+            [('Service', 'keystone-api'), ('ConfigMap', 'keystone-etc'),
+             ('Secret', 'flow')],
+            index.keys())
+        self.assertIn(('Secret', 'flow'), index)
+        self.assertNotIn(('Secret', 'inside-block'), index)
+
+    def test_get_parses_lazily(self):
+        with mock.patch.object(manifest_index.yaml, 'load',
+                               wraps=manifest_index.yaml.load) as mock_load:
+            index = ManifestIndex(MANIFEST)
+            # only the flow style document had to be parsed up front
+            self.assertEqual(2, mock_load.call_count)
+
+            service = index.get('Service', 'keystone-api')
+            index.get('Service', 'keystone-api')
+
+            self.assertEqual(3, mock_load.call_count)
+
+        # the first of duplicate documents wins
+        self.assertEqual(5000, service['spec']['ports'][0]['port'])
+        self.assertIsNone(index.get('Service', 'missing'))
+
+    def test_find_any_kind(self):
+        index = ManifestIndex(MANIFEST)
+
+        self.assertEqual('ConfigMap', index.find('keystone-etc')['kind'])
+        self.assertEqual('default', index.find('missing', 'default'))
+
+    def test_empty_manifest(self):
+        self.assertEqual(0, len(ManifestIndex('')))
+        self.assertEqual(0, len(ManifestIndex(None)))
@@ -0,0 +1,60 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from armada.utils import metrics
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter(self):
+        counter = self.registry.register(
+            metrics.Counter, 'rpcs_total', 'RPCs.', ['method'])
+        counter.inc(method='Install')
+        counter.inc(2, method='Install')
+        counter.inc(method='Li"st')
+
+        self.assertEqual(3, counter.value(method='Install'))
+        self.assertEqual(
+            '# HELP rpcs_total RPCs.\n'
+            '# TYPE rpcs_total counter\n'
+            'rpcs_total{method="Install"} 3\n'
+            'rpcs_total{method="Li\\"st"} 1\n', self.registry.render())
+        self.assertRaises(ValueError, counter.inc, status='OK')
+
+    def test_histogram(self):
+        histogram = self.registry.register(
+            metrics.Histogram, 'duration_seconds', 'Durations.',
+            buckets=(1, 5))
+        histogram.observe(0.5)
+        histogram.observe(2)
+        histogram.observe(10)
+
+        lines = self.registry.render().splitlines()
+        self.assertEqual(['duration_seconds_bucket{le="1"} 1',
+                          'duration_seconds_bucket{le="5"} 2',
+                          'duration_seconds_bucket{le="+Inf"} 3',
+                          'duration_seconds_sum 12.5',
+                          'duration_seconds_count 3'], lines[2:])
+
+    def test_register_once(self):
+        first = self.registry.register(metrics.Counter, 'hits', 'Hits.')
+        self.assertIs(first, self.registry.register(
+            metrics.Counter, 'hits', 'Hits.'))
+        self.assertRaises(ValueError, self.registry.register,
+                          metrics.Histogram, 'hits', 'Hits.')
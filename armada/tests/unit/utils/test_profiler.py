@@ -0,0 +1,70 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from armada.utils import profiler
+
+
+def busy_loop(seconds):
+    deadline = time.time() + seconds
+    total = 0
+    while time.time() < deadline:
+        total += sum(range(100))
+    return total
+
+
+class ProfilerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'apply.pstats')
+
+    def test_profile(self):
+        output = StringIO()
+        result = profiler.profile(lambda: busy_loop(0.1), self.path,
+                                  interval=0.001, stream=output)
+
+        self.assertTrue(result > 0)
+        stats = pstats.Stats(self.path)
+        self.assertIn('busy_loop',
+                      [func[2] for func in stats.stats])
+        self.assertIn('busy_loop', output.getvalue())
+
+        with open(self.path + '.collapsed') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        self.assertTrue(int(count) > 0)
+        self.assertTrue(any('busy_loop' in line for line in lines))
+
+    def test_profile_failure(self):
+        def fail():
+            raise ValueError('invalid manifest')
+
+        self.assertRaises(ValueError, profiler.profile, fail, self.path,
+                          stream=StringIO())
+        self.assertTrue(os.path.exists(self.path))
+        self.assertTrue(os.path.exists(self.path + '.collapsed'))
@@ -24,7 +24,7 @@ class GitTestCase(unittest.TestCase):
     SOURCE_UTILS_LOCATION = 'armada.utils.source'
 
     @mock.patch('armada.utils.source.tempfile')
-    @mock.patch('armada.utils.source.Repo')
+    @mock.patch('git.Repo')
     def test_git_clone_good_url(self, mock_git_repo, mock_temp):
         mock_temp.mkdtemp.return_value = '/tmp/armada'
         mock_git_repo.clone_from.return_value = "Repository"
@@ -46,13 +46,13 @@ class GitTestCase(unittest.TestCase):
             source.git_clone(url)
 
     @mock.patch('armada.utils.source.tempfile')
-    @mock.patch('armada.utils.source.requests')
-    def test_tarball_download(self, mock_requests, mock_temp):
+    @mock.patch('requests.get')
+    def test_tarball_download(self, mock_get, mock_temp):
         url = 'http://localhost:8879/charts/mariadb-0.1.0.tgz'
         mock_temp.mkstemp.return_value = (None, '/tmp/armada')
         mock_response = mock.Mock()
         mock_response.content = 'some string'
-        mock_requests.get.return_value = mock_response
+        mock_get.return_value = mock_response
 
         mock_open = mock.mock_open()
         with mock.patch('{}.open'.format(self.SOURCE_UTILS_LOCATION),
@@ -60,10 +60,9 @@ class GitTestCase(unittest.TestCase):
             source.download_tarball(url)
 
         mock_temp.mkstemp.assert_called_once()
-        mock_requests.get.assert_called_once_with(url)
+        mock_get.assert_called_once_with(url)
         mock_open.assert_called_once_with('/tmp/armada', 'wb')
-        mock_open().write.assert_called_once_with(
-            mock_requests.get(url).content)
+        mock_open().write.assert_called_once_with(mock_get(url).content)
 
     @mock.patch('armada.utils.source.tempfile')
     @mock.patch('armada.utils.source.path')
@@ -0,0 +1,61 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from armada.utils.timeline import Timeline
+
+
+class TimelineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.timeline = Timeline(clock=lambda: self.now)
+
+    def tick(self, seconds):
+        self.now += seconds
+
+    def test_spans(self):
+        with self.timeline.span('mariadb', 'build'):
+            self.tick(2)
+        try:
+            with self.timeline.span('InstallRelease', 'rpc',
+                                    release='mariadb'):
+                self.tick(5)
+                raise Exception('timeout')
+        except Exception:
+            pass
+        self.timeline.finish()
+
+        result = self.timeline.to_dict()
+        self.assertEqual(7, result['duration'])
+        build, rpc = result['spans']
+        self.assertEqual((0, 2, 2),
+                         (build['start'], build['end'], build['duration']))
+        self.assertEqual({'release': 'mariadb', 'error': 'timeout'},
+                         rpc['args'])
+        self.assertEqual([rpc], self.timeline.slowest(1))
+        self.assertEqual([build], self.timeline.slowest(5, 'build'))
+
+    def test_chrome_trace(self):
+        self.tick(1)
+        with self.timeline.span('mariadb', 'wait'):
+            self.tick(0.5)
+
+        events = self.timeline.to_chrome_trace()['traceEvents']
+        self.assertEqual('X', events[0]['ph'])
+        self.assertEqual(('wait', 1000000, 500000),
+                         (events[0]['cat'], events[0]['ts'],
+                          events[0]['dur']))
+        self.assertEqual('thread_name', events[1]['name'])
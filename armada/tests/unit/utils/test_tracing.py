@@ -0,0 +1,75 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from armada.utils import tracing
+
+
+class TracingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = tracing.InMemoryExporter()
+        tracing.configure(self.exporter)
+        self.addCleanup(tracing.configure, None)
+
+    def test_disabled(self):
+        tracing.configure(None)
+        with tracing.span('sync') as span:
+            self.assertIsNone(span)
+        self.assertEqual([], self.exporter.spans)
+
+    def test_nested_spans(self):
+        @tracing.traced('Tiller.InstallRelease')
+        def install():
+            raise Exception('failed')
+
+        with tracing.span('Armada.sync', apply='site') as parent:
+            self.assertRaises(Exception, install)
+
+        child, root = self.exporter.spans
+        self.assertEqual(parent, root)
+        self.assertIsNone(root.parent_id)
+        self.assertEqual(root.context.trace_id, child.context.trace_id)
+        self.assertEqual(root.context.span_id, child.parent_id)
+        self.assertEqual(('ERROR', 'failed'), (child.status, child.error))
+        self.assertEqual({'apply': 'site'}, root.to_dict()['attributes'])
+
+    def test_context_across_threads(self):
+        with tracing.span('request'):
+            context = tracing.current_context()
+
+        def work():
+            with tracing.attach(context):
+                with tracing.span('job'):
+                    pass
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+        request, job = self.exporter.spans
+        self.assertEqual(request.context.trace_id, job.context.trace_id)
+        self.assertEqual(request.context.span_id, job.parent_id)
+
+    def test_traceparent(self):
+        header = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+        context = tracing.SpanContext.from_traceparent(header)
+
+        self.assertEqual('0af7651916cd43dd8448eb211c80319c',
+                         context.trace_id)
+        self.assertEqual(header, context.to_traceparent())
+        self.assertIsNone(tracing.SpanContext.from_traceparent('garbage'))
+        self.assertIsNone(tracing.SpanContext.from_traceparent(None))
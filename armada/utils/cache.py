@@ -0,0 +1,91 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import threading
+import time
+
+
+class TTLCache(object):
+    '''
+    Thread safe least recently used cache whose entries expire
+
+    Every entry lives for at most ttl seconds, or less when an earlier
+    expiry is given when it is set. Once max_size entries are cached the
+    least recently used one is evicted.
+    '''
+
+    def __init__(self, max_size, ttl, clock=time.time):
+        '''
+        :params max_size - maximum number of entries, 0 disables the cache
+        :params ttl - seconds an entry is kept for
+        :params clock - callable returning the current time in seconds
+        '''
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        # key -> (expires at, value)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, default=None):
+        '''
+        Return the cached value of key, or default if it is missing or
+        has expired
+        '''
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                return default
+            # re-insert to mark it as the most recently used entry
+            self._entries[key] = entry
+            return entry[1]
+
+    def set(self, key, value, expires=None):
+        '''
+        :params key - key of the entry
+        :params value - value to cache
+        :params expires - time the value stops being valid, if earlier
+                          than the ttl
+        '''
+        if self.max_size <= 0:
+            return
+
+        deadline = self.clock() + self.ttl
+        if expires is not None:
+            deadline = min(deadline, expires)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (deadline, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        '''
+        Remove key and return its value, or default if it is missing
+        '''
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,161 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+
+def translate(pattern):
+    '''
+    :params pattern - gitignore glob without negation or trailing slash
+
+    Returns the regular expression source matching a slash separated path
+    relative to the chart directory
+    '''
+    # a slash anywhere but at the end anchors the pattern to the chart
+    # directory, otherwise it matches a name at any depth
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    i = 0
+    n = len(pattern)
+    regex = ''
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**', i):
+            at_start = i == 0 or pattern[i - 1] == '/'
+            at_end = i + 2 == n
+            if at_start and at_end:
+                regex += '.*'
+                i += 2
+                continue
+            if at_start and pattern.startswith('**/', i):
+                regex += '(?:.*/)?'
+                i += 3
+                continue
+            # any other run of asterisks behaves like a single one
+            regex += '[^/]*'
+            while i < n and pattern[i] == '*':
+                i += 1
+            continue
+        elif c == '*':
+            regex += '[^/]*'
+        elif c == '?':
+            regex += '[^/]'
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            regex += re.escape(pattern[i])
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                regex += re.escape(c)
+            else:
+                chars = pattern[i + 1:end].replace('\\', '\\\\')
+                if chars[0] in '!^':
+                    chars = '^' + chars[1:]
+                regex += '[%s]' % chars
+                i = end
+        else:
+            regex += re.escape(c)
+        i += 1
+
+    if anchored:
+        return '^%s$' % regex
+    return '^(?:.*/)?%s$' % regex
+
+
+class HelmIgnore(object):
+    '''
+    Compiled .helmignore rules with gitignore semantics
+
+    Rules are parsed once. Consecutive rules with the same polarity are
+    joined into one regular expression, so a path is checked against a
+    handful of expressions instead of every line of the file. The last
+    rule that matches a path decides whether it is ignored.
+    '''
+
+    def __init__(self, patterns):
+        '''
+        :params patterns - lines of a .helmignore file
+        '''
+        rules = []
+        for line in patterns:
+            line = line.rstrip('\n')
+            if line.endswith('\\ '):
+                line = line[:-2].rstrip() + ' '
+            else:
+                line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            elif line.startswith('\\#') or line.startswith('\\!'):
+                line = line[1:]
+
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+
+            rules.append((negate, dir_only, translate(line)))
+
+        # runs of (negate, file regex, directory regex)
+        self.runs = []
+        for negate, dir_only, regex in rules:
+            if not self.runs or self.runs[-1][0] != negate:
+                self.runs.append((negate, [], []))
+            if not dir_only:
+                self.runs[-1][1].append(regex)
+            self.runs[-1][2].append(regex)
+
+        self.runs = [(negate, self._compile(files), self._compile(dirs))
+                     for negate, files, dirs in self.runs]
+
+    @staticmethod
+    def _compile(regexes):
+        if not regexes:
+            return None
+        return re.compile('|'.join('(?:%s)' % r for r in regexes))
+
+    def __len__(self):
+        return len(self.runs)
+
+    def match(self, path, is_dir=False):
+        '''
+        :params path - slash separated path relative to the chart directory
+        :params is_dir - whether the path is a directory
+
+        Returns True if the rules ignore the path itself, without looking
+        at its parent directories
+        '''
+        for negate, file_re, dir_re in reversed(self.runs):
+            regex = dir_re if is_dir else file_re
+            if regex is not None and regex.match(path):
+                return not negate
+        return False
+
+    def ignored(self, path, is_dir=False):
+        '''
+        :params path - slash separated path relative to the chart directory
+        :params is_dir - whether the path is a directory
+
+        Returns True if the path or any of its parent directories is
+        ignored. Files below an ignored directory cannot be re-included.
+        '''
+        parts = path.strip('/').split('/')
+        for i in range(1, len(parts)):
+            if self.match('/'.join(parts[:i]), is_dir=True):
+                return True
+        return self.match('/'.join(parts), is_dir=is_dir)
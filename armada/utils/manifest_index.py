@@ -0,0 +1,172 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import re
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# a document separator starts a line, anything after it on the same line
+# belongs to the next document
+SEPARATOR = re.compile(r'^---(?=[ \t]|$)', re.M)
+
+KIND = re.compile(r'^kind:[ \t]*(\S.*?)[ \t]*$', re.M)
+
+# the indented block following a top level metadata key
+METADATA = re.compile(
+    r'^metadata:[ \t]*\n((?:[ \t]+.*\n|[ \t]*\n)*(?:[ \t]+.*)?)', re.M)
+
+NAME = re.compile(r'^name:[ \t]*(\S.*?)[ \t]*$')
+
+
+def split_documents(manifest):
+    '''
+    :params manifest - YAML stream of rendered documents
+
+    Return the text of every document of the stream, without parsing it
+    '''
+    documents = []
+    start = 0
+    for match in SEPARATOR.finditer(manifest):
+        documents.append(manifest[start:match.start()])
+        start = match.end()
+    documents.append(manifest[start:])
+    return [document for document in documents if document.strip()]
+
+
+def _scalar(value):
+    '''
+    Return a plain or quoted YAML scalar without its quotes, or None if
+    the value needs a real YAML parser
+    '''
+    if value.startswith(("'", '"')):
+        if len(value) > 1 and value[-1] == value[0] and \
+                value[0] not in value[1:-1] and '\\' not in value:
+            return value[1:-1]
+        return None
+    if ' #' in value:
+        value = value.split(' #', 1)[0].rstrip()
+    if not value or value[0] in '&*!|>{[@`%':
+        return None
+    return value
+
+
+def peek(document):
+    '''
+    :params document - text of a single YAML document
+
+    Return the kind and metadata.name of a document by looking at its
+    top level keys only. Either is None when it cannot be read without
+    parsing the document.
+    '''
+    kind = None
+    match = KIND.search(document)
+    if match:
+        kind = _scalar(match.group(1))
+
+    name = None
+    match = METADATA.search(document)
+    if match:
+        indent = None
+        for line in match.group(1).splitlines():
+            stripped = line.lstrip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            depth = len(line) - len(stripped)
+            if indent is None:
+                indent = depth
+            if depth != indent:
+                continue
+            found = NAME.match(stripped)
+            if found:
+                name = _scalar(found.group(1))
+                break
+
+    return kind, name
+
+
+class ManifestIndex(object):
+    '''
+    Rendered release manifest indexed by document kind and name
+
+    The manifest is split on document separators and only the kind and
+    metadata.name of every document are read up front. Documents are
+    parsed with the C safe loader, when available, the first time they
+    are looked up and kept for later lookups.
+    '''
+
+    def __init__(self, manifest):
+        '''
+        :params manifest - YAML stream of the rendered release
+        '''
+        # (kind, name) -> [document text, parsed document or None]
+        self._documents = collections.OrderedDict()
+
+        for text in split_documents(manifest or ''):
+            kind, name = peek(text)
+            parsed = None
+            if kind is None or name is None:
+                # unusual layout, parse it now to learn the key
+                parsed = yaml.load(text, Loader=SafeLoader)
+                if not isinstance(parsed, dict):
+                    continue
+                kind = parsed.get('kind')
+                name = (parsed.get('metadata') or {}).get('name')
+
+            # the first document wins, like a linear search would
+            if (kind, name) not in self._documents:
+                self._documents[(kind, name)] = [text, parsed]
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, key):
+        return key in self._documents
+
+    def keys(self):
+        '''
+        Return the (kind, name) keys in manifest order
+        '''
+        return list(self._documents)
+
+    def get(self, kind, name, default=None):
+        '''
+        :params kind - kind of the document
+        :params name - metadata.name of the document
+
+        Return the parsed document, or default if there is none
+        '''
+        entry = self._documents.get((kind, name))
+        if entry is None:
+            return default
+        if entry[1] is None:
+            entry[1] = yaml.load(entry[0], Loader=SafeLoader)
+        return entry[1]
+
+    def find(self, name, default=None):
+        '''
+        :params name - metadata.name of the document
+
+        Return the first parsed document of any kind with the name, or
+        default if there is none
+        '''
+        for kind, doc_name in self._documents:
+            if doc_name == name:
+                return self.get(kind, doc_name)
+        return default
@@ -0,0 +1,234 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Process wide counters and histograms in the Prometheus text format
+
+Handlers declare their metrics at import time with counter() and
+histogram(). The API serves render() on /metrics and the CLI can write
+it to a file with write().
+'''
+
+import collections
+import contextlib
+import threading
+import time
+
+# Prometheus text exposition format version 0.0.4
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# seconds, from quick RPCs up to the default apply timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+INF = float('inf')
+
+
+def format_value(value):
+    if value == INF:
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace(
+        '\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, escape(value))
+                             for name, value in zip(names, values))
+
+
+class Metric(object):
+    '''
+    Values of a metric, one per combination of label values
+    '''
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        '''
+        :params name - metric name
+        :params help - one line description of the metric
+        :params labels - names of the labels every sample carries
+        '''
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError('%s expects labels %s, got %s' % (
+                self.name, ', '.join(self.labels), ', '.join(labels)))
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        '''
+        Return the lines of the metric in the text format
+        '''
+        lines = ['# HELP %s %s' % (self.name, escape(self.help)),
+                 '# TYPE %s %s' % (self.name, self.type)]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(Metric):
+    '''
+    Value that only goes up
+    '''
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + float(amount)
+
+    def value(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def _samples(self, key, value):
+        yield '%s%s %s' % (self.name, format_labels(self.labels, key),
+                           format_value(value))
+
+
+class Histogram(Metric):
+    '''
+    Distribution of observed values over cumulative buckets
+    '''
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (INF,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        '''
+        Observe the seconds spent in the with block
+        '''
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, **labels)
+
+    def count(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            return sum(self._values.get(key, ([0], 0.0))[0])
+
+    def _samples(self, key, value):
+        counts, total = value
+        names = self.labels + ('le',)
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield '%s_bucket%s %d' % (
+                self.name, format_labels(names, key + (format_value(bound),)),
+                cumulative)
+        labels = format_labels(self.labels, key)
+        yield '%s_sum%s %s' % (self.name, labels, format_value(total))
+        yield '%s_count%s %d' % (self.name, labels, cumulative)
+
+
+class Registry(object):
+    '''
+    Named metrics of a process
+    '''
+
+    def __init__(self):
+        self.metrics = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, cls, name, help, labels=(), **kwargs):
+        '''
+        Return the metric with the name, creating it if needed. Metrics
+        are registered once however often their module is imported.
+        '''
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, help, labels, **kwargs)
+                self.metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError('%s is already registered as a %s' % (
+                    name, metric.type))
+            return metric
+
+    def render(self):
+        '''
+        Return every metric in the Prometheus text format
+        '''
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            for metric in self.metrics.values():
+                metric.reset()
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labels=()):
+    return REGISTRY.register(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram, name, help, labels, buckets=buckets)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def write(path):
+    '''
+    :params path - file to write the metrics of this process to
+    '''
+    with open(path, 'w') as f:
+        f.write(render())
@@ -0,0 +1,127 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Profiling of CLI commands
+
+profile() runs a command under cProfile and a sampling profiler at the
+same time. cProfile yields exact call counts and times, saved as pstats,
+the sampler yields the call stacks cProfile cannot record, saved in the
+collapsed format read by flamegraph.pl and speedscope.
+'''
+
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+# seconds between two samples of the running stacks
+SAMPLE_INTERVAL = 0.005
+
+# number of functions printed after a profiled run
+TOP_FUNCTIONS = 25
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return '%s:%s:%d' % (os.path.basename(code.co_filename), code.co_name,
+                         code.co_firstlineno)
+
+
+class Sampler(object):
+    '''
+    Samples the stacks of every other thread of the process
+    '''
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        '''
+        :params interval - seconds between two samples
+        '''
+        self.interval = interval
+        # collapsed stack -> number of samples
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run,
+                                        name='armada-profiler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        me = threading.current_thread().ident
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        '''
+        :params path - file to write the collapsed stacks to
+        '''
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write('%s %d\n' % (stack, count))
+
+
+def profile(func, path, top=TOP_FUNCTIONS, interval=SAMPLE_INTERVAL,
+            stream=None):
+    '''
+    :params func - callable to profile
+    :params path - file to write the pstats to, the collapsed stacks are
+                   written next to it with a .collapsed suffix
+    :params top - number of functions printed, sorted by their own time
+    :params interval - seconds between two samples of the stacks
+    :params stream - file the top functions are printed to, stdout if
+                     not given
+
+    Call func under the profilers and return its result. The profiles
+    are written even if func raises.
+    '''
+    profiler = cProfile.Profile()
+    sampler = Sampler(interval)
+    start = time.time()
+
+    sampler.start()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        sampler.stop()
+        elapsed = time.time() - start
+
+        profiler.dump_stats(path)
+        sampler.write(path + '.collapsed')
+
+        stream = stream or sys.stdout
+        stream.write('Profiled %.3f seconds, %d stack samples\n' % (
+            elapsed, sum(sampler.stacks.values())))
+        stream.write('Wrote %s and %s.collapsed\n' % (path, path))
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('tottime').print_stats(top)
@@ -14,13 +14,10 @@
 
 from os import path
 import os
-import requests
 import shutil
 import tarfile
 import tempfile
 
-from git import Repo
-
 from ..exceptions import source_exceptions
 
 def git_clone(repo_url, branch='master'):
@@ -30,6 +27,7 @@ def git_clone(repo_url, branch='master'):
 
     Returns a path to the cloned repo
     '''
+    from git import Repo
 
     if repo_url == '':
         raise source_exceptions.GitLocationException(repo_url)
@@ -52,6 +50,8 @@ def download_tarball(tarball_url):
     '''
     Downloads a tarball to /tmp and returns the path
     '''
+    import requests
+
     try:
         tarball_filename = tempfile.mkstemp(prefix='armada')[1]
         response = requests.get(tarball_url)
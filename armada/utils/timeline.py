@@ -0,0 +1,138 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+class Timeline(object):
+    '''
+    Start and end times of the phases of a run
+
+    Every span has a name, e.g. a release or an RPC method, a category,
+    e.g. fetch, build or rpc, and optional arguments. Spans may nest and
+    may be recorded from several threads.
+    '''
+
+    def __init__(self, clock=time.time):
+        '''
+        :params clock - callable returning the current time in seconds
+        '''
+        self.clock = clock
+        self.started = clock()
+        self.finished = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        '''
+        :params name - what the span works on
+        :params category - kind of work done in the span
+
+        Record the with block as a span. Spans left with an exception
+        carry it as their error.
+        '''
+        start = self.clock()
+        try:
+            yield
+        except Exception as e:
+            args['error'] = str(e)
+            raise
+        finally:
+            self.add(name, category, start, self.clock(), **args)
+
+    def add(self, name, category, start, end, **args):
+        '''
+        Record a span that started and ended at the given times
+        '''
+        span = {
+            'name': name,
+            'category': category,
+            'start': start - self.started,
+            'end': end - self.started,
+            'duration': end - start,
+            'thread': threading.current_thread().name,
+        }
+        if args:
+            span['args'] = args
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        self.finished = self.clock()
+
+    def slowest(self, limit, category=None):
+        '''
+        Return up to limit spans taking the most time, slowest first
+        '''
+        with self._lock:
+            spans = [span for span in self.spans
+                     if category is None or span['category'] == category]
+        spans.sort(key=lambda span: span['duration'], reverse=True)
+        return spans[:limit]
+
+    def to_dict(self):
+        '''
+        Return the timeline with span times relative to its start
+        '''
+        finished = self.finished if self.finished is not None \
+            else self.clock()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span['start'])
+        return {
+            'started': self.started,
+            'duration': finished - self.started,
+            'spans': spans,
+        }
+
+    def to_chrome_trace(self):
+        '''
+        Return the timeline in the Chrome trace event format, as loaded by
+        chrome://tracing and Perfetto
+        '''
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for span in self.to_dict()['spans']:
+            tid = threads.setdefault(span['thread'], len(threads) + 1)
+            events.append({
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': int(span['start'] * 1e6),
+                'dur': int(span['duration'] * 1e6),
+                'pid': pid,
+                'tid': tid,
+                'args': span.get('args', {}),
+            })
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': tid, 'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path=None, chrome_trace_path=None):
+        '''
+        :params path - file to write the timeline JSON to
+        :params chrome_trace_path - file to write the Chrome trace to
+        '''
+        if path:
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        if chrome_trace_path:
+            with open(chrome_trace_path, 'w') as f:
+                json.dump(self.to_chrome_trace(), f)
@@ -0,0 +1,259 @@
+# Copyright 2017 The Armada Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Optional tracing of the apply engine, modelled on OpenTelemetry
+
+Spans are only recorded once an exporter is configured with configure(),
+until then span() costs a function call. Every thread keeps its own
+current span, the context of a span can be carried to other threads with
+current_context() and attach(), and to other processes with W3C
+traceparent headers.
+'''
+
+import binascii
+import contextlib
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+TRACEPARENT = re.compile(
+    r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+_exporter = None
+_local = threading.local()
+
+
+def _random_id(size):
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+
+class SpanContext(object):
+    '''
+    Identifies a span within a trace
+    '''
+
+    def __init__(self, trace_id, span_id):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def to_traceparent(self):
+        return '00-%s-%s-01' % (self.trace_id, self.span_id)
+
+    @classmethod
+    def from_traceparent(cls, header):
+        '''
+        Return the context of a traceparent header, or None if the header
+        is missing or malformed
+        '''
+        match = TRACEPARENT.match((header or '').strip().lower())
+        if match is None:
+            return None
+        return cls(match.group(1), match.group(2))
+
+
+class Span(object):
+    '''
+    A named, timed operation of a trace
+    '''
+
+    def __init__(self, name, parent=None, attributes=None):
+        '''
+        :params name - name of the operation
+        :params parent - SpanContext of the parent span, a new trace is
+                         started without one
+        :params attributes - dict of attributes describing the operation
+        '''
+        self.name = name
+        trace_id = parent.trace_id if parent else _random_id(16)
+        self.context = SpanContext(trace_id, _random_id(8))
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.end = None
+        self.status = 'OK'
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        result = {
+            'name': self.name,
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'parentSpanId': self.parent_id,
+            'startTimeUnixNano': int(self.start * 1e9),
+            'endTimeUnixNano': int((self.end or self.start) * 1e9),
+            'attributes': self.attributes,
+            'status': self.status,
+            'thread': threading.current_thread().name,
+        }
+        if self.error is not None:
+            result['error'] = self.error
+        return result
+
+
+class InMemoryExporter(object):
+    '''
+    Keeps finished spans in a list, for tests and offline inspection
+    '''
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            del self.spans[:]
+
+
+class FileExporter(object):
+    '''
+    Appends finished spans to a file, one JSON object per line
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), sort_keys=True)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+
+def configure(exporter):
+    '''
+    :params exporter - object with an export(span) method, None disables
+                       tracing
+
+    Set the exporter finished spans of this process are sent to
+    '''
+    global _exporter
+    _exporter = exporter
+
+
+def enabled():
+    return _exporter is not None
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_context():
+    '''
+    Return the SpanContext of the current span of this thread, or None
+    '''
+    stack = _stack()
+    if not stack:
+        return None
+    if isinstance(stack[-1], Span):
+        return stack[-1].context
+    return stack[-1]
+
+
+def current_span():
+    '''
+    Return the span of this thread currently recording, or None
+    '''
+    stack = _stack()
+    if stack and isinstance(stack[-1], Span):
+        return stack[-1]
+    return None
+
+
+@contextlib.contextmanager
+def attach(context):
+    '''
+    :params context - SpanContext, e.g. from another thread or a
+                      traceparent header, or None
+
+    Make spans started in the with block children of the context
+    '''
+    if context is None:
+        yield
+        return
+
+    stack = _stack()
+    stack.append(context)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    '''
+    :params name - name of the operation
+
+    Record the with block as a child of the current span and yield the
+    Span, or None while tracing is disabled
+    '''
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    if isinstance(parent, Span):
+        parent = parent.context
+    current = Span(name, parent, attributes)
+    stack.append(current)
+    try:
+        yield current
+    except Exception as e:
+        current.status = 'ERROR'
+        current.error = str(e)
+        raise
+    finally:
+        stack.pop()
+        current.end = time.time()
+        try:
+            exporter.export(current)
+        except Exception:
+            # tracing must never break the traced operation
+            pass
+
+
+def traced(name=None):
+    '''
+    Decorator recording every call of a function as a span, named after
+    the function unless a name is given
+    '''
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
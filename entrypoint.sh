@@ -1,12 +1,13 @@
 #!/bin/bash
 
 CMD="armada"
-PORT="8000"
 
 set -e
 
 if [ "$1" = 'server' ]; then
-    exec gunicorn server:api -b :$PORT --chdir armada/api
+    # the API reads request files relative to its package directory
+    cd armada/api
+    exec armada-api "${@:2}"
 fi
 
 if [ "$1" = 'tiller' ] || [ "$1" = 'apply' ]; then